@@ -1,12 +1,15 @@
 from django.contrib import admin
-from .models import User, Team, Activity, Leaderboard, Workout
+from .models import User, Team, Activity, Leaderboard, Workout, ActivityRollup
+from .search import TextSearchAdminMixin
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(TextSearchAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'email', 'team', 'created_at')
     list_filter = ('team', 'created_at')
+    # Matched by the text index (see search), not by regex
     search_fields = ('name', 'email', 'team')
+    search_kind = 'users'
     ordering = ('-created_at',)
 
 
@@ -34,8 +37,17 @@ class LeaderboardAdmin(admin.ModelAdmin):
 
 
 @admin.register(Workout)
-class WorkoutAdmin(admin.ModelAdmin):
+class WorkoutAdmin(TextSearchAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'activity_type', 'difficulty', 'duration', 'calories_estimate', 'created_at')
     list_filter = ('activity_type', 'difficulty', 'created_at')
+    # Matched by the text index (see search), not by regex
     search_fields = ('name', 'activity_type', 'description')
+    search_kind = 'workouts'
     ordering = ('-created_at',)
+
+
+@admin.register(ActivityRollup)
+class ActivityRollupAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'key', 'period', 'start', 'activities', 'duration', 'calories', 'distance')
+    list_filter = ('scope', 'period')
+    ordering = ('-start',)
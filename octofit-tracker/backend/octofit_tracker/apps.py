@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+
+
+class OctofitTrackerConfig(AppConfig):
+    name = 'octofit_tracker'
+
+    def ready(self):
+        from pymongo import monitoring
+
+        from . import signals  # noqa: F401
+        from .instrumentation import CommandTimer, PoolMetrics
+        from .querybudget import BudgetListener
+
+        # Must happen before the first MongoClient is created.
+        monitoring.register(CommandTimer())
+        monitoring.register(BudgetListener())
+        monitoring.register(PoolMetrics())
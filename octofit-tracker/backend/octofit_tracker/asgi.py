@@ -9,8 +9,19 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'octofit_tracker.settings')
+# Serve the hot GET endpoints with the async handlers in async_views.py
+os.environ.setdefault('OCTOFIT_ASYNC_API', 'true')
 
 application = get_asgi_application()
+
+# Connect before the first request arrives. Servers that fork after loading
+# the application (gunicorn --preload) must not do this in the parent, as
+# pymongo clients are not fork-safe.
+if settings.MONGO_WARM_UP:
+    from octofit_tracker.mongo import warm_up
+
+    warm_up()
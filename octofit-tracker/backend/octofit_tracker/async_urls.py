@@ -0,0 +1,18 @@
+"""URL configuration used when the API runs in async mode under ASGI.
+
+The async handlers take over GET requests for the hot endpoints; every
+other route falls through to the regular URL configuration.
+"""
+from django.urls import path, re_path
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/stats/', async_views.stats),
+    re_path(r'^api/(?P<resource>users|activities|leaderboard)/$', async_views.resource_list),
+    re_path(
+        r'^api/(?P<resource>users|activities|leaderboard)/(?P<pk>[0-9a-f]{24})/$',
+        async_views.resource_detail,
+    ),
+] + sync_urlpatterns
@@ -0,0 +1,130 @@
+"""Async handlers for the read-heavy endpoints, served under ASGI.
+
+DRF 3.14 views are synchronous, and under ASGI Django runs sync views one
+at a time on a single thread, so the Dashboard's parallel requests queue up
+behind each other. These handlers answer GET list/detail requests for the
+hot resources and the stats summary with motor, producing the same JSON as
+the DRF views. Writes and browsable-API requests are handed to the regular
+viewsets, and so are reads of viewsets with a response cache (the
+leaderboard): a cache hit costs no query, and the cache, ETags and 304s
+then behave exactly as under WSGI.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.request import Request
+
+from . import caching, fieldsets
+from .caching import CachedResponseMixin
+from .fast_serializers import compile_serializer
+from .models import User, Team, Activity, Leaderboard
+from .mongo import get_async_collection, to_object_id
+from .renderers import TimedJSONRenderer
+from .views import (
+    UserViewSet,
+    ActivityViewSet,
+    LeaderboardViewSet,
+    STATS_MODELS,
+    STATS_PIPELINE,
+    TOP_USERS_PROJECTION,
+    build_stats,
+)
+
+RESOURCES = {
+    'users': UserViewSet,
+    'activities': ActivityViewSet,
+    'leaderboard': LeaderboardViewSet,
+}
+
+_renderer = TimedJSONRenderer()
+_sync_views = {}
+
+
+def _json(data, status=200):
+    return HttpResponse(_renderer.render(data), content_type='application/json', status=status)
+
+
+def _error_data(exc):
+    # Validation errors are keyed by parameter, like the DRF views render them.
+    return exc.detail if isinstance(exc, ValidationError) else {'detail': exc.detail}
+
+
+def _wants_sync(request, viewset):
+    return (request.method != 'GET' or 'text/html' in request.headers.get('Accept', '')
+            or issubclass(viewset, CachedResponseMixin))
+
+
+def _sync_view(viewset, detail):
+    key = (viewset, detail)
+    if key not in _sync_views:
+        if detail:
+            actions = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+        else:
+            actions = {'get': 'list', 'post': 'create'}
+        _sync_views[key] = sync_to_async(viewset.as_view(actions))
+    return _sync_views[key]
+
+
+async def resource_list(request, resource):
+    viewset = RESOURCES[resource]
+    passthrough = getattr(viewset, 'sync_query_params', ())
+    if _wants_sync(request, viewset) or any(param in request.GET for param in passthrough):
+        return await _sync_view(viewset, detail=False)(request)
+
+    collection = get_async_collection(viewset.queryset.model, read_only=viewset.secondary_reads)
+    paginator = viewset.pagination_class()
+    try:
+        fieldset = fieldsets.parse(request.GET, viewset.serializer_class)
+        query, spec, limit = paginator.document_query({}, Request(request), viewset)
+    except APIException as exc:
+        return _json(_error_data(exc), exc.status_code)
+    serializer = compile_serializer(viewset.serializer_class, documents=True, fields=fieldset)
+    projection = None
+    if fieldset is not None:
+        projection = fieldsets.projection(viewset.serializer_class, fieldset, paginator.ordering)
+    documents = await collection.find(query, projection).sort(spec).to_list(limit)
+    page = paginator.document_page(documents)
+    return _json(paginator.get_document_page_data(serializer.many(page)))
+
+
+async def resource_detail(request, resource, pk):
+    viewset = RESOURCES[resource]
+    if _wants_sync(request, viewset):
+        lookup = viewset.lookup_url_kwarg or viewset.lookup_field
+        return await _sync_view(viewset, detail=True)(request, **{lookup: pk})
+
+    try:
+        fieldset = fieldsets.parse(request.GET, viewset.serializer_class)
+    except APIException as exc:
+        return _json(_error_data(exc), exc.status_code)
+    projection = None if fieldset is None else fieldsets.projection(viewset.serializer_class, fieldset)
+    collection = get_async_collection(viewset.queryset.model, read_only=viewset.secondary_reads)
+    document = await collection.find_one({'_id': to_object_id(pk)}, projection)
+    if document is None:
+        return _json({'detail': viewset.not_found_message or 'Not found.'}, 404)
+    serializer = compile_serializer(viewset.serializer_class, documents=True, fields=fieldset)
+    return _json(serializer.to_representation(document))
+
+
+async def stats(request):
+    key = caching.summary_key('stats', STATS_MODELS)
+    data = caching.get_summary(key)
+    if data is None:
+        facets, top_users, total_users, total_teams = await asyncio.gather(
+            get_async_collection(Activity, read_only=True).aggregate(STATS_PIPELINE).to_list(1),
+            get_async_collection(Leaderboard, read_only=True).find({}, TOP_USERS_PROJECTION)
+            .sort('rank', 1).limit(3).to_list(3),
+            get_async_collection(User, read_only=True).estimated_document_count(),
+            get_async_collection(Team, read_only=True).estimated_document_count(),
+        )
+        data = build_stats(facets[0], top_users, total_users, total_teams)
+        caching.set_summary(key, data)
+    return _json(data)
+
+
+# DRF views are CSRF exempt and these handlers delegate writes to them.
+# Django 4.1's csrf_exempt decorator is not async-aware, so set the flag.
+for _view in (resource_list, resource_detail, stats):
+    _view.csrf_exempt = True
@@ -0,0 +1,82 @@
+"""Helpers for the API benchmark suite (``manage.py benchmark_api``).
+
+Datasets are generated with ``populate_db``'s synthetic generator from a
+fixed seed, so every run at a given scale sees identical data. Results
+are plain JSON so a run can be stored and used as the baseline of the
+next one; ``compare`` lists the measurements that regressed.
+"""
+import math
+
+from django.db import connections
+
+# scale: (users, mean activities per user, teams)
+SCALES = {
+    'small': (200, 10, 5),
+    'medium': (2000, 20, 20),
+    'large': (20000, 25, 100),
+}
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(position), math.ceil(position)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(latencies, queries, errors):
+    """Summarize per-request latencies (ms) and MongoDB command counts."""
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else 0.0,
+    }
+
+
+def compare(baseline, current, threshold, min_delta_ms=1.0, metric='p95_ms'):
+    """Return a description of every case that regressed against ``baseline``.
+
+    Latency regresses when ``metric`` grows by more than ``threshold``
+    (a fraction) and by at least ``min_delta_ms``, so sub-millisecond
+    noise does not fail a run. Queries per request regress on any
+    increase; they do not depend on the machine.
+    """
+    regressions = []
+    for scale, cases in current.items():
+        for case, result in cases.items():
+            before = baseline.get(scale, {}).get(case)
+            if before is None:
+                continue
+            old, new = before[metric], result[metric]
+            if new > old * (1 + threshold) and new - old >= min_delta_ms:
+                regressions.append(f'{scale}/{case}: {metric} {old:.2f} -> {new:.2f} ms')
+            if result['queries_per_request'] > before['queries_per_request']:
+                regressions.append(
+                    f"{scale}/{case}: queries/request {before['queries_per_request']} "
+                    f"-> {result['queries_per_request']}"
+                )
+    return regressions
+
+
+def use_database(name, alias='default'):
+    """Point the connection at database ``name`` (reconnecting lazily)."""
+    connection = connections[alias]
+    connection.close()
+    connection.settings_dict['NAME'] = name
+
+
+def use_mongomock(alias='default'):
+    """Serve djongo and pymongo access from an in-memory mongomock client."""
+    import djongo.database
+    import mongomock
+
+    djongo.database.MongoClient = mongomock.MongoClient
+    djongo.database.clients.clear()
+    connections[alias].close()
@@ -0,0 +1,120 @@
+"""Response caching for read-mostly viewsets.
+
+Rendered responses are cached with Django's cache framework under a key
+that includes a per-model generation token. Writing a row of the model
+replaces the token (see ``invalidate``), so every cached page of that model
+becomes unreachable at once without having to enumerate the keys. Cached
+responses carry an ETag and conditional requests get a 304. Summaries
+computed from several models (the dashboard stats) are cached the same way
+under a key holding each model's generation. The ``API_CACHE_ENABLED``
+setting turns the cache off.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from .models import User
+
+
+def _generation_key(model):
+    return f'octofit:generation:{model._meta.label_lower}'
+
+
+def generation(model):
+    key = _generation_key(model)
+    cache.add(key, uuid.uuid4().hex, None)
+    return cache.get(key, '')
+
+
+def invalidate(model):
+    cache.set(_generation_key(model), uuid.uuid4().hex, None)
+
+
+def _enabled():
+    return getattr(settings, 'API_CACHE_ENABLED', True)
+
+
+def summary_key(name, models):
+    """Cache key for the ``name`` summary; a write to any of ``models`` changes it."""
+    return ':'.join(['octofit:summary', name, *(generation(model) for model in models)])
+
+
+def get_summary(key):
+    return cache.get(key) if _enabled() else None
+
+
+def set_summary(key, data):
+    if _enabled():
+        cache.set(key, data, settings.API_CACHE_TIMEOUT)
+
+
+def _matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = [candidate.removeprefix('W/') for candidate in parse_etags(header)]
+    return '*' in candidates or etag in candidates
+
+
+class CachedResponseMixin:
+    """Cache ``list`` and ``retrieve`` responses until the model is written."""
+
+    def get_cache_key(self, request):
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        generations = [generation(self.queryset.model)]
+        if 'user' in getattr(self, 'expand', ()):
+            # ?expand=user embeds user summaries; see expand.ExpandMixin.
+            generations.append(generation(User))
+        return ':'.join([
+            'octofit:response',
+            self.queryset.model._meta.label_lower,
+            *generations,
+            request.accepted_renderer.format,
+            path,
+        ])
+
+    def _cached(self, request, compute):
+        if not _enabled():
+            return compute()
+        key = self.get_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            self._cache_key = key
+            return compute()
+
+        content, content_type, etag = entry
+        if _matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, '_cache_key', None)
+        if key is None or response.status_code != 200:
+            return response
+
+        self._cache_key = None
+        response.render()
+        etag = f'"{hashlib.md5(response.content).hexdigest()}"'
+        cache.set(key, (response.content, response['Content-Type'], etag), settings.API_CACHE_TIMEOUT)
+        response['ETag'] = etag
+        response['X-Cache'] = 'MISS'
+        if _matches(request, etag):
+            not_modified = HttpResponseNotModified()
+            not_modified['ETag'] = etag
+            return not_modified
+        return response
@@ -0,0 +1,146 @@
+"""Calorie estimates from MET values, for activities logged without calories.
+
+A MET (metabolic equivalent) is the energy cost of an activity relative to
+sitting still; the values below come from the Compendium of Physical
+Activities. Burned energy is ``MET * 3.5 * weight_kg / 200`` kcal per
+minute (the ACSM formula). For activities with a distance, the MET follows
+the pace: it is interpolated between the Compendium's speed bands, and the
+type's general value is used when there is no distance.
+
+``estimate_many`` works on whole columns with NumPy, so bulk paths (the
+bulk endpoint, ``import_data``, the ``estimate_calories`` backfill and
+synthetic data) price a chunk in one pass plus one query for the users'
+weights; ``estimate`` is the single-activity form used when the API
+creates an activity.
+"""
+import numpy as np
+from pymongo import UpdateOne
+
+from .models import Activity, User
+from . import caching, synthetic
+from .mongo import get_collection, to_object_id
+
+# activity_type (casefolded): (general MET, ((speed in km/h, MET), ...) or None)
+METS = {
+    'running': (8.0, ((6.4, 6.0), (8.0, 8.3), (9.7, 9.8), (11.3, 11.0), (12.9, 11.8),
+                      (14.5, 12.8), (16.1, 14.5), (17.7, 16.0), (19.3, 19.0))),
+    'walking': (3.5, ((3.2, 2.8), (4.8, 3.5), (5.6, 4.3), (6.4, 5.0), (7.2, 7.0))),
+    'cycling': (7.5, ((14.0, 4.0), (17.5, 6.8), (20.5, 8.0), (24.0, 10.0), (28.0, 12.0), (32.0, 15.8))),
+    'swimming': (6.0, ((1.5, 4.8), (2.7, 5.8), (3.0, 8.3), (4.1, 9.8))),
+    'weightlifting': (5.0, None),
+    'yoga': (2.5, None),
+    'boxing': (7.8, None),
+}
+DEFAULT_MET = 5.0
+DEFAULT_WEIGHT = 70.0  # kg, for users who have not entered theirs
+# Fields an estimate reads from an activity.
+INPUTS = ('user_id', 'activity_type', 'duration', 'distance')
+
+
+def _floats(values, size):
+    if values is None:
+        return np.full(size, np.nan)
+    # None becomes NaN.
+    return np.asarray(values, dtype=float)
+
+
+def mets(activity_types, durations, distances=None):
+    """MET of each activity; see the module docstring."""
+    durations = _floats(durations, len(durations))
+    distances = _floats(distances, len(durations))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speeds = distances / (durations / 60)
+    paced = np.isfinite(speeds) & (speeds > 0)
+
+    result = np.full(len(durations), DEFAULT_MET)
+    names, rows = np.unique(np.asarray(activity_types, dtype=str), return_inverse=True)
+    for index, name in enumerate(names):
+        general, bands = METS.get(name.casefold(), (DEFAULT_MET, None))
+        selected = rows == index
+        result[selected] = general
+        if bands is not None:
+            selected &= paced
+            speed_points, met_points = zip(*bands)
+            result[selected] = np.interp(speeds[selected], speed_points, met_points)
+    return result
+
+
+def estimate_many(activity_types, durations, distances=None, weights=None):
+    """kcal (int array) for row-aligned columns; missing weights use ``DEFAULT_WEIGHT``."""
+    durations = _floats(durations, len(durations))
+    weights = _floats(weights, len(durations))
+    weights = np.where(np.isfinite(weights) & (weights > 0), weights, DEFAULT_WEIGHT)
+    kcal = mets(activity_types, durations, distances) * 3.5 * weights / 200 * np.maximum(durations, 0)
+    return np.rint(kcal).astype(np.int64)
+
+
+def estimate(activity_type, duration, distance=None, weight=None):
+    return int(estimate_many([activity_type], [duration], [distance], [weight])[0])
+
+
+def user_weights(user_ids):
+    """``{user_id: weight}`` for the users among ``user_ids`` who entered one."""
+    ids = [object_id for object_id in map(to_object_id, set(user_ids)) if object_id is not None]
+    if not ids:
+        return {}
+    return {
+        str(user['_id']): user['weight']
+        for user in get_collection(User).find({'_id': {'$in': ids}, 'weight': {'$gt': 0}}, {'weight': 1})
+    }
+
+
+def estimate_activity(values):
+    """Estimate for one activity's ``INPUTS``, looking up the user's weight."""
+    weight = user_weights([values['user_id']]).get(values['user_id'])
+    return estimate(values['activity_type'], values['duration'], values.get('distance'), weight)
+
+
+def estimate_documents(documents):
+    """Estimates for activity documents, with one query for the users' weights."""
+    weights = user_weights(document['user_id'] for document in documents)
+    return estimate_many(
+        [document['activity_type'] for document in documents],
+        [document['duration'] for document in documents],
+        [document.get('distance') for document in documents],
+        [weights.get(document['user_id']) for document in documents],
+    )
+
+
+def fill_missing(documents):
+    """Set ``calories`` where it is missing or ``None``; returns how many were set."""
+    missing = [document for document in documents if document.get('calories') is None]
+    if missing:
+        for document, kcal in zip(missing, estimate_documents(missing)):
+            document['calories'] = int(kcal)
+    return len(missing)
+
+
+def backfill(recompute=False, chunk_size=10000, dry_run=False, progress=None):
+    """Estimate calories over the activities collection in streaming chunks.
+
+    Only activities without calories are touched unless ``recompute``, which
+    replaces every value (client-sent ones included) with the estimate.
+    ``progress`` is called with ``(scanned, updated)`` after each chunk.
+    Returns ``(scanned, updated)``; the caller rebuilds the leaderboard and
+    rollups when anything changed.
+    """
+    collection = get_collection(Activity)
+    query = {} if recompute else {'calories': None}
+    projection = {field: 1 for field in INPUTS + ('calories',)}
+    scanned = updated = 0
+    for chunk in synthetic.chunked(collection.find(query, projection, batch_size=chunk_size), chunk_size):
+        estimates = estimate_documents(chunk)
+        changed = [
+            UpdateOne({'_id': document['_id']}, {'$set': {'calories': int(kcal)}})
+            for document, kcal in zip(chunk, estimates)
+            if document.get('calories') != kcal
+        ]
+        if changed and not dry_run:
+            collection.bulk_write(changed, ordered=False)
+        scanned += len(chunk)
+        updated += len(changed)
+        if progress:
+            progress(scanned, updated)
+    if updated and not dry_run:
+        caching.invalidate(Activity)
+    return scanned, updated
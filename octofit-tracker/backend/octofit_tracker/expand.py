@@ -0,0 +1,82 @@
+"""``?expand=user``: embed user summaries in rows that carry a ``user_id``.
+
+Activities and leaderboard entries reference users by a plain string id.
+Instead of one lookup per row, ``UserResolver`` collects the distinct ids
+of a page and fetches them with a single ``$in`` query; it keeps what it
+has fetched (misses included) for the rest of the request, so ids that
+repeat across a page, or across calls within one request, are free.
+"""
+from rest_framework.exceptions import ValidationError
+
+from .models import User
+from .mongo import get_collection, to_object_id
+
+USER_SUMMARY_PROJECTION = {'name': 1, 'team': 1}
+
+
+class UserResolver:
+    """Per-request identity map from ``user_id`` to a compact user summary."""
+
+    def __init__(self):
+        self.users = {}
+
+    def resolve(self, user_ids):
+        missing = {user_id for user_id in user_ids if user_id not in self.users}
+        if missing:
+            self.users.update(dict.fromkeys(missing))
+            object_ids = [oid for oid in (to_object_id(user_id) for user_id in missing) if oid]
+            if object_ids:
+                for user in get_collection(User).find({'_id': {'$in': object_ids}}, USER_SUMMARY_PROJECTION):
+                    user_id = str(user['_id'])
+                    self.users[user_id] = {
+                        '_id': user_id,
+                        'name': user.get('name'),
+                        'team': user.get('team'),
+                    }
+        return {user_id: self.users[user_id] for user_id in user_ids}
+
+    def embed(self, rows):
+        users = self.resolve({row['user_id'] for row in rows if row.get('user_id')})
+        for row in rows:
+            row['user'] = users.get(row.get('user_id'))
+        return rows
+
+
+def _rows(data):
+    if isinstance(data, list):
+        return data
+    if not isinstance(data, dict):
+        return []
+    if isinstance(data.get('results'), list):
+        return data['results'] + ([data['me']] if isinstance(data.get('me'), dict) else [])
+    return [data] if 'user_id' in data else []
+
+
+class ExpandMixin:
+    """Handle ``?expand=`` on every read of the viewset.
+
+    Expansion runs on the serialized data in ``finalize_response``, so it
+    covers the ORM, fast and native read paths alike and happens before
+    ``CachedResponseMixin`` renders and stores the response.
+    """
+    expandable = ('user',)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        value = request.query_params.get('expand', '')
+        self.expand = {part.strip() for part in value.split(',') if part.strip()}
+        unknown = self.expand - set(self.expandable)
+        if unknown:
+            raise ValidationError({'expand': [f'Expected one of: {", ".join(self.expandable)}.']})
+
+    def get_user_resolver(self):
+        if not hasattr(self, '_user_resolver'):
+            self._user_resolver = UserResolver()
+        return self._user_resolver
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        data = getattr(response, 'data', None)
+        if 'user' in getattr(self, 'expand', ()) and request.method == 'GET' \
+                and response.status_code == 200 and data is not None:
+            self.get_user_resolver().embed(_rows(data))
+        return super().finalize_response(request, response, *args, **kwargs)
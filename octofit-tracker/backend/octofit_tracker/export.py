@@ -0,0 +1,90 @@
+"""Streaming export of activities as NDJSON or CSV.
+
+Documents are read from a cursor with a bounded ``batch_size`` and encoded
+one batch at a time, so memory use does not grow with the collection no
+matter how many rows are exported. ``since`` selects activities created
+after a timestamp for incremental exports, served by the ``created_at``
+index; gzip is applied to the encoded chunks as they are produced.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Activity
+from .mongo import get_collection, serialize_document
+from .synthetic import chunked
+
+FIELDS = ('_id', 'user_id', 'activity_type', 'duration', 'calories', 'distance', 'date', 'created_at')
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def default_batch_size():
+    return getattr(settings, 'EXPORT_BATCH_SIZE', 2000)
+
+
+def parse_since(value):
+    """Parse an ISO 8601 date or datetime (naive values are UTC)."""
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        since = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(since):
+        since = since.replace(tzinfo=dt_timezone.utc)
+    return since
+
+
+def iter_activities(since=None, batch_size=None):
+    query = {'created_at': {'$gt': since}} if since is not None else {}
+    projection = dict.fromkeys(FIELDS, 1)
+    return get_collection(Activity).find(query, projection, batch_size=batch_size or default_batch_size()) \
+        .sort('created_at', 1)
+
+
+def _row(document):
+    return serialize_document({field: document.get(field) for field in FIELDS})
+
+
+def ndjson_chunks(documents, batch_size):
+    for batch in chunked(documents, batch_size):
+        yield ''.join(
+            json.dumps(_row(document), ensure_ascii=False, separators=(',', ':')) + '\n'
+            for document in batch
+        ).encode()
+
+
+def csv_chunks(documents, batch_size):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS, lineterminator='\n')
+    writer.writeheader()
+    for batch in chunked(documents, batch_size):
+        writer.writerows(_row(document) for document in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_activities(output_format='ndjson', since=None, batch_size=None, compress=False):
+    """Return an iterator of encoded (and optionally gzipped) byte chunks."""
+    batch_size = batch_size or default_batch_size()
+    encode = csv_chunks if output_format == 'csv' else ndjson_chunks
+    chunks = encode(iter_activities(since, batch_size), batch_size)
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,115 @@
+"""Sparse fieldsets: ``?fields=name,team`` and ``?exclude=bio`` on reads.
+
+The selection restricts the serializer output and what is read from
+MongoDB. The native path passes a projection to ``find``. The ORM path uses
+``QuerySet.only``, which djongo turns into a projection. Either way,
+unselected fields are never read off disk, sent by mongod or serialized.
+The projection also keeps the fields the keyset cursor is built from,
+which are dropped again when the page is serialized.
+"""
+from functools import lru_cache
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+ACTIONS = ('list', 'retrieve')
+
+
+@lru_cache(maxsize=None)
+def columns(serializer_class):
+    """``{field name: document key}`` of the fields ``serializer_class`` renders."""
+    model = serializer_class.Meta.model
+    result = {}
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            # The _id and id fields, rendered from the primary key.
+            result[name] = '_id'
+        else:
+            result[name] = model._meta.get_field(field.source).column
+    return result
+
+
+def _names(params, name):
+    return [part.strip() for part in params.get(name, '').split(',') if part.strip()]
+
+
+def parse(params, serializer_class, required=()):
+    """The selected field names, in the serializer's order; ``None`` selects all.
+
+    ``required`` names are added to any selection (``expand=user`` needs
+    ``user_id``, for instance).
+    """
+    if FIELDS_PARAM not in params and EXCLUDE_PARAM not in params:
+        return None
+    available = columns(serializer_class)
+    selected, excluded = _names(params, FIELDS_PARAM), _names(params, EXCLUDE_PARAM)
+    for param, names in ((FIELDS_PARAM, selected), (EXCLUDE_PARAM, excluded)):
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ValidationError({param: [
+                f'Unknown fields: {", ".join(unknown)}. Expected any of: {", ".join(available)}.'
+            ]})
+    chosen = (set(selected) or set(available)) - set(excluded)
+    if not chosen:
+        raise ValidationError({FIELDS_PARAM: ['Select at least one field.']})
+    chosen |= set(required) & set(available)
+    return tuple(name for name in available if name in chosen)
+
+
+def projection(serializer_class, fieldset, ordering=()):
+    """Mongo projection for ``fieldset`` plus the fields of ``ordering``."""
+    keys = {columns(serializer_class)[name] for name in fieldset}
+    keys.update(field.lstrip('-') for field in ordering)
+    return dict.fromkeys(sorted(keys), 1)
+
+
+def model_fields(serializer_class, fieldset):
+    """Model field names for ``QuerySet.only``."""
+    model = serializer_class.Meta.model
+    by_column = {field.column: field.name for field in model._meta.concrete_fields}
+    names = {by_column[columns(serializer_class)[name]] for name in fieldset}
+    return sorted(names | {model._meta.pk.name})
+
+
+def restrict(row, fieldset):
+    """``row`` (a serialized dict) without the keys outside ``fieldset``."""
+    return {key: value for key, value in row.items() if key in fieldset}
+
+
+class SparseFieldsetMixin:
+    """Handle ``?fields=`` and ``?exclude=`` on ``list`` and ``retrieve``.
+
+    Must come before ``NativeReadMixin`` and ``ExpandMixin`` in the bases.
+    """
+    fieldset = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.fieldset = None
+        if request.method == 'GET' and self.action in ACTIONS:
+            required = ('user_id',) if 'user' in getattr(self, 'expand', ()) else ()
+            self.fieldset = parse(request.query_params, self.get_serializer_class(), required)
+
+    def get_document_projection(self):
+        if self.fieldset is None:
+            return super().get_document_projection()
+        return projection(self.get_serializer_class(), self.fieldset, getattr(self, 'cursor_ordering', ()))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.fieldset is None:
+            return queryset
+        return queryset.only(*model_fields(self.get_serializer_class(), self.fieldset))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.fieldset is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in self.fieldset:
+                    target.fields.pop(name)
+        return serializer
@@ -0,0 +1,136 @@
+"""Index-aware filtering and ordering for the activity list.
+
+Query parameters are compiled straight into a Mongo filter and sort
+(``compile_activity_query``). Only combinations an index can serve are
+accepted; anything else is rejected with a 400 that lists the supported
+combinations, so a filter can never turn into a collection scan.
+
+A combination is served by an index when
+
+* the index starts with some of the equality filters (``user_id``,
+  ``activity_type``) and continues with the ordering field and ``_id``, the
+  tie-breaker of the keyset pagination, so no in-memory sort is needed;
+* the scan is bounded: it is narrowed by an equality on the index prefix or
+  by a range on the ordering field, or there is nothing left to filter.
+
+Filters the index does not cover are applied to the documents it returns.
+The whitelist is derived from the model's declared indexes, so adding an
+index (with a migration) is all it takes to allow a new combination.
+"""
+from datetime import timedelta
+
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .export import parse_since
+from .indexes import declared_indexes
+from .models import Activity
+
+EQUALITY_FILTERS = ('user_id', 'activity_type')
+# parameter: (field, operator)
+RANGE_FILTERS = {
+    'date_from': ('date', '$gte'),
+    'date_to': ('date', '$lte'),
+    'min_calories': ('calories', '$gte'),
+}
+ORDERINGS = ('date', 'calories')
+DEFAULT_ORDERING = '-date'
+PARAMS = EQUALITY_FILTERS + tuple(RANGE_FILTERS) + ('ordering',)
+
+
+def _parse_date(name, value, end=False):
+    try:
+        moment = parse_since(value)
+    except ValueError:
+        raise ValidationError({name: ['Expected an ISO 8601 date or datetime.']})
+    if end and parse_date(value) is not None:
+        # A bare date includes the whole day.
+        return '$lt', moment + timedelta(days=1)
+    return None, moment
+
+
+def _parse_int(name, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: ['A valid integer is required.']})
+
+
+def index_plans(model=Activity):
+    """Return ``[(index name, [equality fields], ordering field)]`` usable for filtering."""
+    plans = []
+    for name, (keys, _) in declared_indexes(model).items():
+        columns = [column for column, _ in keys]
+        if len(columns) < 2 or columns[-1] != '_id' or columns[-2] not in ORDERINGS:
+            continue
+        prefix = columns[:-2]
+        if all(column in EQUALITY_FILTERS for column in prefix):
+            plans.append((name, prefix, columns[-2]))
+    return plans
+
+
+def choose_index(equalities, ranges, ordering_field, model=Activity):
+    """Name of the index serving the query, or ``None`` when there is none."""
+    best = None
+    for name, prefix, field in index_plans(model):
+        if field != ordering_field or not set(prefix) <= set(equalities):
+            continue
+        residual = (set(equalities) - set(prefix)) | (set(ranges) - {field})
+        bounded = bool(prefix) or field in ranges
+        if (bounded or not residual) and (best is None or len(prefix) > len(best[1])):
+            best = (name, prefix)
+    return best[0] if best else None
+
+
+def describe_supported(model=Activity):
+    combinations = []
+    for _, prefix, field in index_plans(model):
+        filters = ' + '.join(prefix) or 'no filter'
+        combinations.append(f'{filters} (ordering by {field})')
+    return '; '.join(sorted(combinations))
+
+
+def compile_activity_query(params):
+    """Compile query parameters into ``(filter, ordering)``; ``None`` when there are none.
+
+    ``ordering`` is a Django-style tuple ending in the ``_id`` tie-breaker,
+    ready to be used as the view's ``cursor_ordering``.
+    """
+    if not any(param in params for param in PARAMS):
+        return None
+
+    query = {}
+    for name in EQUALITY_FILTERS:
+        if params.get(name):
+            query[name] = params[name]
+
+    ranges = {}
+    for name, (field, operator) in RANGE_FILTERS.items():
+        value = params.get(name)
+        if not value:
+            continue
+        if field == 'date':
+            override, value = _parse_date(name, value, end=name == 'date_to')
+            operator = override or operator
+        else:
+            value = _parse_int(name, value)
+        ranges.setdefault(field, {})[operator] = value
+    query.update(ranges)
+
+    ordering = params.get('ordering') or DEFAULT_ORDERING
+    field = ordering.lstrip('-')
+    if field not in ORDERINGS or ordering.count('-') > 1:
+        raise ValidationError({'ordering': [
+            f'Expected one of: {", ".join(ORDERINGS)} (prefix with - for descending).'
+        ]})
+
+    equalities = [name for name in EQUALITY_FILTERS if name in query]
+    if choose_index(equalities, ranges, field) is None:
+        used = ', '.join(equalities + [name for name in RANGE_FILTERS if params.get(name)]) or 'no filter'
+        raise ValidationError({'filters': [
+            f'No index serves filtering on {used} ordered by {field}. '
+            f'Supported combinations: {describe_supported()}.'
+        ]})
+
+    tie_breaker = '-_id' if ordering.startswith('-') else '_id'
+    return query, (ordering, tie_breaker)
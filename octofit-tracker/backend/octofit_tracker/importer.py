@@ -0,0 +1,265 @@
+"""Streaming bulk import of activities, users and workouts from CSV/NDJSON.
+
+Files are read lazily and cut into batches. Each batch is validated with
+the model's serializer and written with a single unordered bulk operation:
+activities are inserted, users are upserted on ``email`` and workouts on
+``name``; blank values leave the fields of existing rows alone. Batches
+can be handed to a pool of worker processes; at most a few batches per
+worker are in flight, so memory stays bounded however large the file is.
+
+After every batch the number of records processed so far (the longest run
+of finished batches from the start of the file) is saved to a checkpoint
+file next to the source, and an interrupted import resumes from there.
+Batches that finished past that point are written again on resume, which
+is harmless: upserts are idempotent and imported activities get an
+``_id`` derived from the file contents and record number, so re-inserting
+them only produces duplicate-key errors that are counted as skipped.
+
+Leaderboard and rollups are not maintained per batch; ``run_import``'s
+caller rebuilds them once at the end (see the ``import_data`` command).
+"""
+import csv
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import deque
+from functools import lru_cache
+
+from bson import ObjectId
+from django.utils import timezone
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from rest_framework.exceptions import ValidationError
+from rest_framework.validators import UniqueValidator
+
+from . import energy, rollups
+from .models import Activity, User, Workout
+from .mongo import get_collection, to_document
+from .serializers import ActivitySerializer, UserSerializer, WorkoutSerializer
+from .synthetic import chunked
+
+# kind: (model, serializer, natural key used for upserts; None = insert)
+KINDS = {
+    'activities': (Activity, ActivitySerializer, None),
+    'users': (User, UserSerializer, 'email'),
+    'workouts': (Workout, WorkoutSerializer, 'name'),
+}
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+DUPLICATE_KEY = 11000
+MAX_REPORTED_ERRORS = 100
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f'Cannot tell the format of {path}; use .csv, .ndjson or .jsonl')
+    return FORMATS[extension]
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_records(path, file_format=None):
+    """Yield one dict per record. Empty CSV cells become ``None``."""
+    file_format = file_format or detect_format(path)
+    with _open(path) as source:
+        if file_format == 'csv':
+            for row in csv.DictReader(source):
+                yield {key: (value if value != '' else None) for key, value in row.items()}
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def fingerprint(path):
+    """Identify a file by a hash of its whole contents.
+
+    Imported activity ``_id``s are derived from it, so two files must only
+    share a fingerprint when they are identical; a sample of the file would
+    let an edited copy collide and its activities be skipped as duplicates.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def activity_id(source, index, date):
+    """A stable ObjectId for record ``index`` of ``source``, timestamped at ``date``."""
+    timestamp = int(date.timestamp()) & 0xFFFFFFFF
+    suffix = hashlib.blake2b(f'{source}:{index}'.encode(), digest_size=8).digest()
+    return ObjectId(timestamp.to_bytes(4, 'big') + suffix)
+
+
+@lru_cache(maxsize=None)
+def _validator(kind):
+    # Activities without calories are estimated per batch, in import_batch.
+    serializer = KINDS[kind][1](context={'estimate_calories': False})
+    # Existing rows are updated rather than rejected, so drop the per-row
+    # uniqueness queries the model serializer would otherwise run.
+    for field in serializer.fields.values():
+        field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+    return serializer
+
+
+def _result():
+    return {'created': 0, 'updated': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+
+
+def _upsert(natural_key, document, now):
+    # Blank cells (None) only fill new documents: a partial file must not
+    # wipe fields of existing ones.
+    values = {key: value for key, value in document.items() if value is not None}
+    blanks = {key: None for key, value in document.items() if value is None}
+    return UpdateOne(
+        {natural_key: document[natural_key]},
+        {'$set': values, '$setOnInsert': {**blanks, 'created_at': now}},
+        upsert=True,
+    )
+
+
+def import_batch(kind, source, records):
+    """Validate and write ``[(index, record), ...]``; return counts and errors."""
+    model, _, natural_key = KINDS[kind]
+    validator = _validator(kind)
+    result = _result()
+    now = timezone.now()
+
+    documents = {}
+    by_key = {}
+    for index, record in records:
+        try:
+            validated = validator.run_validation(record)
+        except ValidationError as exc:
+            result['failed'] += 1
+            result['errors'].append((index, json.loads(json.dumps(exc.detail))))
+            continue
+        document = to_document(model, validated)
+        if natural_key is None:
+            document.setdefault('distance', None)
+            document['_id'] = activity_id(source, index, document['date'])
+            document['created_at'] = now
+        else:
+            # The last record wins when a key repeats within a batch.
+            previous = by_key.get(document[natural_key])
+            if previous is not None:
+                del documents[previous]
+                result['skipped'] += 1
+            by_key[document[natural_key]] = index
+            if model is User:
+                document['updated_at'] = now
+        documents[index] = document
+
+    if not documents:
+        return result
+    if natural_key is None:
+        energy.fill_missing(documents.values())
+        rollups.assign_teams(documents.values())
+    collection = get_collection(model)
+    counts = {'nInserted': 0, 'nUpserted': 0, 'nMatched': 0}
+    try:
+        if natural_key is None:
+            inserted = collection.insert_many(list(documents.values()), ordered=False)
+            counts['nInserted'] = len(inserted.inserted_ids)
+        else:
+            counts.update(collection.bulk_write([
+                _upsert(natural_key, document, now) for document in documents.values()
+            ], ordered=False).bulk_api_result)
+    except BulkWriteError as exc:
+        counts.update(exc.details)
+        positions = list(documents)
+        for error in exc.details.get('writeErrors', []):
+            if error.get('code') == DUPLICATE_KEY and natural_key is None:
+                result['skipped'] += 1
+                continue
+            result['failed'] += 1
+            message = error.get('errmsg', 'write error')
+            result['errors'].append((positions[error['index']], {'non_field_errors': [message]}))
+
+    result['created'] += counts['nInserted'] + counts['nUpserted']
+    result['updated'] += counts['nMatched']
+    return result
+
+
+def _setup_worker():
+    import django
+    django.setup()
+
+
+def checkpoint_path(path, directory=None):
+    return os.path.join(directory or os.path.dirname(os.path.abspath(path)),
+                        os.path.basename(path) + '.checkpoint')
+
+
+def load_checkpoint(path, source):
+    """Return the number of records already processed for this exact file."""
+    try:
+        with open(path) as checkpoint:
+            state = json.load(checkpoint)
+    except (OSError, ValueError):
+        return 0
+    return state['records'] if state.get('source') == source else 0
+
+
+def save_checkpoint(path, source, records):
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as checkpoint:
+        json.dump({'source': source, 'records': records}, checkpoint)
+    os.replace(temporary, path)
+
+
+def run_import(path, kind, batch_size=5000, workers=1, checkpoint=None, file_format=None, progress=None):
+    """Import every record of ``path`` and return the summed counts.
+
+    ``checkpoint`` is the checkpoint file (``None`` disables resuming).
+    ``progress`` is called with ``(records_done, result)`` after each batch
+    and sees every error; the returned totals keep the first
+    ``MAX_REPORTED_ERRORS`` as ``(record_number, detail)``, counting from 0.
+    """
+    file_format = file_format or detect_format(path)
+    source = fingerprint(path)
+    done = load_checkpoint(checkpoint, source) if checkpoint else 0
+    totals = _result()
+    totals['resumed_from'] = done
+
+    records = read_records(path, file_format)
+    batches = chunked(((index, record) for index, record in enumerate(records) if index >= done), batch_size)
+
+    def finished(batch_end, result):
+        for key in ('created', 'updated', 'skipped', 'failed'):
+            totals[key] += result[key]
+        totals['errors'].extend(result['errors'][:MAX_REPORTED_ERRORS - len(totals['errors'])])
+        if checkpoint:
+            save_checkpoint(checkpoint, source, batch_end)
+        if progress:
+            progress(batch_end, result)
+
+    if workers <= 1:
+        for batch in batches:
+            finished(batch[-1][0] + 1, import_batch(kind, source, batch))
+    else:
+        # Keep a bounded window of batches in flight and collect them in
+        # submission order, so the checkpoint only ever covers a prefix.
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(workers, initializer=_setup_worker) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append((batch[-1][0] + 1, pool.apply_async(import_batch, (kind, source, batch))))
+                if len(pending) >= workers * 2:
+                    batch_end, handle = pending.popleft()
+                    finished(batch_end, handle.get())
+            while pending:
+                batch_end, handle = pending.popleft()
+                finished(batch_end, handle.get())
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return totals
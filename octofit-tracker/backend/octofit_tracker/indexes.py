@@ -0,0 +1,126 @@
+"""Reconcile MongoDB indexes with the indexes declared on the models.
+
+Both ``Meta.indexes`` and field-based ``UniqueConstraint``s are covered.
+
+Migrations create the declared indexes through djongo, but databases that
+were populated before the indexes existed, or restored from a dump, drift.
+``reconcile`` brings a collection back in line idempotently and
+``find_collection_scans`` runs ``explain()`` on the queries the API issues
+to spot any that still fall back to a collection scan.
+"""
+from django.apps import apps
+from django.db import models
+
+from .mongo import get_collection
+
+
+def _keys(model, field_names):
+    keys = []
+    for field_name in field_names:
+        direction = -1 if field_name.startswith('-') else 1
+        column = model._meta.get_field(field_name.lstrip('-')).column
+        keys.append((column, direction))
+    return keys
+
+
+def declared_indexes(model):
+    """Return ``{name: ([(field, direction), ...], unique)}`` for a model."""
+    declared = {}
+    for index in model._meta.indexes:
+        declared[index.name] = (_keys(model, index.fields), False)
+    for constraint in model._meta.constraints:
+        if isinstance(constraint, models.UniqueConstraint) and constraint.fields:
+            declared[constraint.name] = (_keys(model, constraint.fields), True)
+    return declared
+
+
+def reconcile(model, prune=False, dry_run=False):
+    """Create missing indexes and rebuild ones whose keys changed.
+
+    Returns a list of ``(action, index_name)`` tuples describing what was
+    (or, with ``dry_run``, would be) done.
+    """
+    collection = get_collection(model)
+    existing = collection.index_information()
+    actions = []
+
+    for name, (keys, unique) in declared_indexes(model).items():
+        current = existing.get(name)
+        if current is not None \
+                and [(field, int(direction)) for field, direction in current['key']] == keys \
+                and bool(current.get('unique')) == unique:
+            continue
+        if current is not None:
+            actions.append(('rebuild', name))
+            if not dry_run:
+                collection.drop_index(name)
+        else:
+            actions.append(('create', name))
+        if not dry_run:
+            collection.create_index(keys, name=name, unique=unique, background=True)
+
+    if prune:
+        declared = declared_indexes(model)
+        for name, info in existing.items():
+            # Text indexes are managed by ``search``.
+            if name == '_id_' or name in declared or info.get('unique') or 'weights' in info:
+                continue
+            actions.append(('drop', name))
+            if not dry_run:
+                collection.drop_index(name)
+    return actions
+
+
+def app_models():
+    return list(apps.get_app_config('octofit_tracker').get_models())
+
+
+# Representative queries issued by the viewsets and the leaderboard engine.
+QUERY_PATTERNS = [
+    ('Activity', 'activities by user, newest first',
+     lambda c: c.find({'user_id': ''}).sort([('date', -1), ('_id', -1)]).limit(50)),
+    ('Activity', 'activity list page',
+     lambda c: c.find({}).sort([('date', -1), ('_id', -1)]).limit(50)),
+    ('Activity', 'activities by type',
+     lambda c: c.find({'activity_type': ''}).sort([('date', -1), ('_id', -1)]).limit(50)),
+    ('Activity', 'activities by user, most calories first',
+     lambda c: c.find({'user_id': '', 'calories': {'$gte': 0}}).sort([('calories', -1), ('_id', -1)]).limit(50)),
+    ('Leaderboard', 'leaderboard page',
+     lambda c: c.find({}).sort([('rank', 1), ('_id', 1)]).limit(50)),
+    ('Leaderboard', 'entry lookup by user',
+     lambda c: c.find({'user_id': ''})),
+    ('Leaderboard', 'rank computation',
+     lambda c: c.find({'total_calories': {'$gt': 0}})),
+    ('Leaderboard', 'team ranking',
+     lambda c: c.find({'team': ''}).sort([('total_calories', -1)])),
+    ('User', 'users by team',
+     lambda c: c.find({'team': ''})),
+    ('Workout', 'workouts by type',
+     lambda c: c.find({'activity_type': ''})),
+    ('ActivityRollup', 'trend series',
+     lambda c: c.find({'scope': 'user', 'key': '', 'period': 'day', 'start': {'$gte': 0}}).sort([('start', 1)])),
+    ('ActivityRollup', 'windowed leaderboard',
+     lambda c: c.find({'scope': 'user', 'period': 'day', 'start': {'$gte': 0}})),
+    ('ActivityRollup', 'team totals',
+     lambda c: c.find({'scope': 'team', 'period': 'week'})),
+]
+
+
+def _plan_stages(plan):
+    yield plan.get('stage')
+    if 'inputStage' in plan:
+        yield from _plan_stages(plan['inputStage'])
+    for stage in plan.get('inputStages', []):
+        yield from _plan_stages(stage)
+
+
+def find_collection_scans():
+    """Return ``(model_name, description)`` for every pattern planned as COLLSCAN."""
+    scans = []
+    for model_name, description, build in QUERY_PATTERNS:
+        model = apps.get_model('octofit_tracker', model_name)
+        explanation = build(get_collection(model)).explain()
+        plan = explanation.get('queryPlanner', {}).get('winningPlan', {})
+        if 'COLLSCAN' in _plan_stages(plan):
+            scans.append((model_name, description))
+    return scans
@@ -0,0 +1,81 @@
+"""Bulk activity ingestion.
+
+Items are validated one by one with ``ActivitySerializer`` so a bad row
+only fails itself, then written with unordered ``insert_many`` calls in
+fixed-size chunks. Leaderboard totals are applied once per affected user
+and rollup buckets with one bulk write after the batch, instead of once per
+activity. Missing calories are estimated and teams recorded a chunk at a
+time; see ``energy`` and ``rollups``.
+"""
+from django.conf import settings
+from django.utils import timezone
+from pymongo.errors import BulkWriteError
+from rest_framework.exceptions import ValidationError
+
+from . import caching, energy, leaderboard, rollups
+from .models import Activity
+from .mongo import get_collection, to_document
+from .serializers import ActivitySerializer
+
+
+def default_chunk_size():
+    return getattr(settings, 'BULK_INSERT_CHUNK_SIZE', 1000)
+
+
+def _to_document(validated, created_at):
+    document = to_document(Activity, validated)
+    document.setdefault('distance', None)
+    document['created_at'] = created_at
+    return document
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def insert_activities(items, chunk_size=None):
+    """Validate and insert ``items``; return one result dict per item."""
+    chunk_size = chunk_size or default_chunk_size()
+    validator = ActivitySerializer(context={'estimate_calories': False})
+    results = [None] * len(items)
+    pending = []
+    now = timezone.now()
+
+    for index, item in enumerate(items):
+        try:
+            validated = validator.run_validation(item)
+        except ValidationError as exc:
+            results[index] = {'index': index, 'status': 'error', 'errors': exc.detail}
+            continue
+        pending.append((index, _to_document(validated, now)))
+
+    collection = get_collection(Activity)
+    deltas = {}
+    inserted = []
+    for chunk in _chunks(pending, chunk_size):
+        failed = {}
+        energy.fill_missing([document for _, document in chunk])
+        rollups.assign_teams([document for _, document in chunk])
+        try:
+            collection.insert_many([document for _, document in chunk], ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get('writeErrors', []):
+                failed[error['index']] = error.get('errmsg', 'write error')
+        for position, (index, document) in enumerate(chunk):
+            if position in failed:
+                results[index] = {
+                    'index': index, 'status': 'error',
+                    'errors': {'non_field_errors': [failed[position]]},
+                }
+                continue
+            results[index] = {'index': index, 'status': 'created', '_id': str(document['_id'])}
+            inserted.append(document)
+            calories, count = deltas.get(document['user_id'], (0, 0))
+            deltas[document['user_id']] = (calories + document['calories'], count + 1)
+
+    if inserted:
+        caching.invalidate(Activity)
+    leaderboard.apply_deltas(deltas)
+    rollups.record_activities(inserted)
+    return results
@@ -0,0 +1,316 @@
+"""Per-request performance metrics.
+
+``RequestMetricsMiddleware`` measures every request and breaks the time
+down into MongoDB time and query count (collected from pymongo's command
+monitoring, so djongo's queries are counted too), serialization and
+rendering. The breakdown is sent back in a ``Server-Timing`` header and
+aggregated per viewset action into in-memory histograms, exposed in the
+Prometheus text format by ``/api/_metrics``. Histograms live in the
+process, so each worker reports its own.
+
+``PoolMetrics`` follows pymongo's connection pool events and reports how
+many connections each pool holds and lends out, how long requests wait
+for one, and how often a checkout fails (``timeout`` means the pool was
+exhausted for ``waitQueueTimeoutMS``).
+
+Commands issued by motor run on its executor threads and are not
+attributed to the request.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from pymongo import monitoring
+
+_current = contextvars.ContextVar('octofit_request_stats', default=None)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db', 'timings')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.timings = {}
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+
+def current_stats():
+    return _current.get()
+
+
+@contextmanager
+def timer(name):
+    """Add the time spent in the block to the current request's ``name`` timing."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(name, time.perf_counter() - start)
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Attribute every MongoDB command to the request that issued it."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db += event.duration_micros / 1e6
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Track pool size, connections in use and checkout waits per server."""
+
+    def __init__(self):
+        self.waits = threading.local()
+
+    def _server(self, event):
+        return (f'{event.address[0]}:{event.address[1]}',)
+
+    def pool_created(self, event):
+        POOL_MAX_SIZE.set(self._server(event), event.options.get('maxPoolSize', 100))
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        for gauge in (POOL_CONNECTIONS, POOL_CHECKED_OUT, POOL_MAX_SIZE):
+            gauge.set(self._server(event), 0)
+
+    def connection_created(self, event):
+        POOL_CONNECTIONS.inc(self._server(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        POOL_CONNECTIONS.inc(self._server(event), -1)
+
+    def connection_check_out_started(self, event):
+        self.waits.start = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._waited(event)
+        POOL_CHECKOUT_FAILURES.inc(self._server(event) + (event.reason,))
+
+    def connection_checked_out(self, event):
+        self._waited(event)
+        POOL_CHECKED_OUT.inc(self._server(event))
+
+    def connection_checked_in(self, event):
+        POOL_CHECKED_OUT.inc(self._server(event), -1)
+
+    def _waited(self, event):
+        start = getattr(self.waits, 'start', None)
+        if start is not None:
+            POOL_WAIT_SECONDS.observe(self._server(event), time.perf_counter() - start)
+            self.waits.start = None
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self.series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = _number(bound) if bound != '+Inf' else bound
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self.lock:
+            series = dict(self.series)
+        for labels, value in sorted(series.items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, labels, value):
+        with self.lock:
+            self.series[labels] = value
+
+    def expose(self):
+        lines = super().expose()
+        lines[1] = f'# TYPE {self.name} gauge'
+        return lines
+
+
+LABELS = ('view', 'method')
+REQUESTS = Counter('octofit_requests_total', 'Requests handled.', LABELS + ('status',))
+REQUEST_SECONDS = Histogram(
+    'octofit_request_duration_seconds', 'Wall time per request.', LABELS, LATENCY_BUCKETS)
+DB_SECONDS = Histogram(
+    'octofit_db_duration_seconds', 'MongoDB time per request.', LABELS, LATENCY_BUCKETS)
+DB_QUERIES = Histogram(
+    'octofit_db_queries', 'MongoDB commands per request.', LABELS, QUERY_BUCKETS)
+SERIALIZATION_SECONDS = Histogram(
+    'octofit_serialization_duration_seconds', 'Serialization and rendering time per request.',
+    LABELS, LATENCY_BUCKETS)
+POOL_CONNECTIONS = Gauge(
+    'octofit_mongo_pool_connections', 'Open connections in the MongoDB pool.', ('server',))
+POOL_CHECKED_OUT = Gauge(
+    'octofit_mongo_pool_checked_out', 'MongoDB connections currently in use.', ('server',))
+POOL_MAX_SIZE = Gauge(
+    'octofit_mongo_pool_max_size', 'maxPoolSize of the MongoDB pool.', ('server',))
+POOL_WAIT_SECONDS = Histogram(
+    'octofit_mongo_pool_wait_seconds', 'Time spent waiting for a pooled connection.', ('server',),
+    LATENCY_BUCKETS)
+POOL_CHECKOUT_FAILURES = Counter(
+    'octofit_mongo_pool_checkout_failures_total', 'Failed connection checkouts.', ('server', 'reason'))
+METRICS = [
+    REQUESTS, REQUEST_SECONDS, DB_SECONDS, DB_QUERIES, SERIALIZATION_SECONDS,
+    POOL_CONNECTIONS, POOL_CHECKED_OUT, POOL_MAX_SIZE, POOL_WAIT_SECONDS, POOL_CHECKOUT_FAILURES,
+]
+
+
+def expose():
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+def view_label(request):
+    """``ActivityViewSet.list``-style name of the view that handled ``request``."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    actions = getattr(view, 'actions', None)
+    if actions:
+        method = request.method.lower()
+        return f'{view.cls.__name__}.{actions.get(method, method)}'
+    name = match.url_name or getattr(view, '__name__', type(view).__name__)
+    if 'resource' in match.kwargs:
+        name = f'{name}[{match.kwargs["resource"]}]'
+    return name
+
+
+def server_timing(stats, total):
+    entries = [f'db;dur={stats.db * 1000:.2f};desc="{stats.queries} queries"']
+    entries.extend(f'{name};dur={seconds * 1000:.2f}' for name, seconds in stats.timings.items())
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+class RequestMetricsMiddleware:
+    """Time each request and record it under its view; see the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        # Same marker MiddlewareMixin sets, so the handler keeps this layer async.
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        else:
+            self._is_coroutine = None
+
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    def finish(self, request, response, stats, total):
+        labels = (view_label(request), request.method)
+        REQUESTS.inc(labels + (str(response.status_code),))
+        REQUEST_SECONDS.observe(labels, total)
+        DB_SECONDS.observe(labels, stats.db)
+        DB_QUERIES.observe(labels, stats.queries)
+        SERIALIZATION_SECONDS.observe(labels, sum(stats.timings.values()))
+        response['Server-Timing'] = server_timing(stats, total)
+        response['Timing-Allow-Origin'] = '*'
+        return response
@@ -0,0 +1,280 @@
+"""Incremental leaderboard maintenance.
+
+Totals are kept up to date with atomic ``$inc`` updates as activities are
+written. Ranks use competition ranking (1 + number of entries with strictly
+more calories), so when an entry moves from ``old`` to ``new`` calories only
+the entries whose totals lie between the two values change rank; their
+ranks are recomputed from the current totals (see ``_rerank``) instead of
+renumbering the whole collection. The steps of a write are not one
+transaction: two concurrent writes over overlapping bands may leave stale
+ranks in the band, but the next write over it sets them right again
+rather than compounding the error. ``rebuild`` recomputes everything
+from the activities collection and is meant for seeding and repair, not
+for the request path. Both paths write with pymongo, so they
+invalidate cached leaderboard responses themselves.
+
+Windowed leaderboards (last 7 days, last month, ...) cannot be maintained
+this way because entries age out of the window, so ``windowed`` sums the
+per-user daily rollups over the window with a single ``$group``.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+from pymongo import ReturnDocument, UpdateMany
+
+from . import caching, rollups
+from .models import Activity, ActivityRollup, Leaderboard, User
+from .mongo import get_collection, to_object_id
+
+
+def _user_summary(user_id):
+    object_id = to_object_id(user_id)
+    user = None
+    if object_id is not None:
+        user = get_collection(User).find_one({'_id': object_id}, {'name': 1, 'team': 1})
+    if user is None:
+        return {'user_name': '', 'team': ''}
+    return {'user_name': user.get('name') or '', 'team': user.get('team') or ''}
+
+
+def _rerank(collection, low, high):
+    """Set the rank of every entry with ``low <= total_calories <= high``.
+
+    Ranks are recomputed from the current totals (one count above the band
+    plus the sizes of the totals in it) rather than shifted by one, so
+    re-running it, or running it after a concurrent write, cannot drift.
+    """
+    groups = list(collection.aggregate([
+        {'$match': {'total_calories': {'$gte': low, '$lte': high}}},
+        {'$group': {'_id': '$total_calories', 'count': {'$sum': 1}}},
+        {'$sort': {'_id': -1}},
+    ]))
+    if not groups:
+        return
+    rank = collection.count_documents({'total_calories': {'$gt': high}}) + 1
+    updates = []
+    for group in groups:
+        updates.append(UpdateMany(
+            {'total_calories': group['_id'], 'rank': {'$ne': rank}}, {'$set': {'rank': rank}},
+        ))
+        rank += group['count']
+    collection.bulk_write(updates, ordered=False)
+
+
+def apply_delta(user_id, calories, activities):
+    """Add ``calories`` and ``activities`` to a user's entry and re-rank it."""
+    if not calories and not activities:
+        return
+    collection = get_collection(Leaderboard)
+    update = {
+        '$inc': {'total_calories': calories, 'total_activities': activities},
+        '$set': {'updated_at': timezone.now()},
+    }
+    previous = collection.find_one_and_update(
+        {'user_id': user_id}, update,
+        projection={'total_calories': 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if previous is None:
+        # First activity for this user: create the entry. Another request
+        # may have inserted it meanwhile, in which case the upsert simply
+        # increments and hands back the previous document.
+        update['$setOnInsert'] = dict(_user_summary(user_id), rank=0)
+        previous = collection.find_one_and_update(
+            {'user_id': user_id}, update,
+            projection={'total_calories': 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+    old_total = previous['total_calories'] if previous else 0
+    new_total = old_total + calories
+
+    _rerank(collection, min(old_total, new_total), max(old_total, new_total))
+    caching.invalidate(Leaderboard)
+
+
+def apply_deltas(deltas):
+    """Apply ``{user_id: (calories, activities)}`` accumulated over a batch."""
+    for user_id, (calories, activities) in deltas.items():
+        apply_delta(user_id, calories, activities)
+
+
+def record_activity(activity):
+    apply_delta(activity.user_id, activity.calories, 1)
+
+
+def remove_activity(activity):
+    apply_delta(activity.user_id, -activity.calories, -1)
+
+
+def update_activity(previous_user_id, previous_calories, activity):
+    if previous_user_id == activity.user_id:
+        apply_delta(activity.user_id, activity.calories - previous_calories, 0)
+    else:
+        apply_delta(previous_user_id, -previous_calories, -1)
+        record_activity(activity)
+
+
+def write_entries(rows, batch_size=10000):
+    """Replace the leaderboard with ``rows``, ranked by ``total_calories``.
+
+    Each row needs ``user_id``, ``user_name``, ``team``, ``total_calories``
+    and ``total_activities``.
+    """
+    rows = sorted(rows, key=lambda row: row['total_calories'], reverse=True)
+    now = timezone.now()
+    rank = 0
+    previous_total = None
+    for position, row in enumerate(rows, start=1):
+        if row['total_calories'] != previous_total:
+            rank, previous_total = position, row['total_calories']
+        row['rank'] = rank
+        row['updated_at'] = now
+
+    collection = get_collection(Leaderboard)
+    collection.delete_many({})
+    for start in range(0, len(rows), batch_size):
+        collection.insert_many(rows[start:start + batch_size], ordered=False)
+    caching.invalidate(Leaderboard)
+    return len(rows)
+
+
+def rebuild():
+    """Recompute every entry from the activities collection in one pass."""
+    totals = list(get_collection(Activity).aggregate([
+        {'$group': {
+            '_id': '$user_id',
+            'total_calories': {'$sum': '$calories'},
+            'total_activities': {'$sum': 1},
+        }},
+    ], allowDiskUse=True))
+    object_ids = [oid for oid in (to_object_id(row['_id']) for row in totals) if oid]
+    users = {
+        str(user['_id']): user
+        for user in get_collection(User).find({'_id': {'$in': object_ids}}, {'name': 1, 'team': 1})
+    }
+
+    rows = []
+    for row in totals:
+        user = users.get(row['_id'], {})
+        rows.append({
+            'user_id': row['_id'],
+            'user_name': user.get('name') or '',
+            'team': user.get('team') or '',
+            'total_calories': row['total_calories'],
+            'total_activities': row['total_activities'],
+        })
+    return write_entries(rows)
+
+
+WINDOW_ALIASES = {'week': '7d', 'month': '30d'}
+MAX_WINDOW_DAYS = 366
+
+
+def parse_window(value):
+    """Return ``(period, start)`` for a window such as ``7d``, ``4w`` or ``all``.
+
+    Bounded windows are summed from daily rollups and end today (UTC);
+    ``all`` sums weekly rollups, which cover the same totals in fewer
+    documents. Raises ``ValueError`` for anything else.
+    """
+    value = WINDOW_ALIASES.get(value, value)
+    if value == 'all':
+        return 'week', None
+    if len(value) < 2 or value[-1] not in 'dw' or not value[:-1].isdigit():
+        raise ValueError(value)
+    days = int(value[:-1]) * (7 if value[-1] == 'w' else 1)
+    if not 1 <= days <= MAX_WINDOW_DAYS:
+        raise ValueError(value)
+    return 'day', rollups.bucket_start(timezone.now(), 'day') - timedelta(days=days - 1)
+
+
+def _team_members(team):
+    return [str(user['_id']) for user in get_collection(User, read_only=True).find({'team': team}, {'_id': 1})]
+
+
+def _user_total(match, user_id):
+    totals = {'total_calories': 0, 'total_activities': 0}
+    for bucket in get_collection(ActivityRollup, read_only=True).find(
+        dict(match, key=user_id), {'calories': 1, 'activities': 1},
+    ):
+        totals['total_calories'] += bucket['calories']
+        totals['total_activities'] += bucket['activities']
+    return totals
+
+
+def windowed(period, start, team=None, limit=10, user_id=None):
+    """Rank users by calories within a window, optionally within one team.
+
+    Returns ``{'participants', 'results', 'me'}`` where ``results`` holds the
+    top ``limit`` entries and ``me`` the entry for ``user_id`` (or ``None``
+    when that user has no activity in the window). Ranks use the same
+    competition ranking as the all-time leaderboard.
+    """
+    match = {'scope': 'user', 'period': period}
+    if start is not None:
+        match['start'] = {'$gte': start}
+    me = None
+    if user_id is not None:
+        me = _user_total(match, user_id)
+    if team is not None:
+        members = _team_members(team)
+        if user_id not in members:
+            me = None
+        match['key'] = {'$in': members}
+
+    facets = {
+        'top': [{'$sort': {'total_calories': -1, '_id': 1}}, {'$limit': limit}],
+        'participants': [{'$count': 'value'}],
+    }
+    if me is not None and me['total_activities'] > 0:
+        facets['ahead'] = [{'$match': {'total_calories': {'$gt': me['total_calories']}}}, {'$count': 'value'}]
+    else:
+        me = None
+
+    result = next(get_collection(ActivityRollup, read_only=True).aggregate([
+        {'$match': match},
+        {'$group': {
+            '_id': '$key',
+            'total_calories': {'$sum': '$calories'},
+            'total_activities': {'$sum': '$activities'},
+        }},
+        {'$match': {'total_activities': {'$gt': 0}}},
+        {'$facet': facets},
+    ], allowDiskUse=True))
+
+    rows = []
+    rank = 0
+    previous_total = None
+    for position, row in enumerate(result['top'], start=1):
+        if row['total_calories'] != previous_total:
+            rank, previous_total = position, row['total_calories']
+        rows.append(dict(row, rank=rank, user_id=row['_id']))
+    if me is not None:
+        ahead = result.get('ahead')
+        me = dict(me, rank=(ahead[0]['value'] if ahead else 0) + 1, user_id=user_id)
+
+    entries = rows + ([me] if me else [])
+    object_ids = [oid for oid in (to_object_id(entry['user_id']) for entry in entries) if oid]
+    users = {
+        str(user['_id']): user
+        for user in get_collection(User, read_only=True).find({'_id': {'$in': object_ids}}, {'name': 1, 'team': 1})
+    }
+
+    def entry(row):
+        user = users.get(row['user_id'], {})
+        return {
+            'rank': row['rank'],
+            'user_id': row['user_id'],
+            'user_name': user.get('name') or '',
+            'team': user.get('team') or '',
+            'total_calories': row['total_calories'],
+            'total_activities': row['total_activities'],
+        }
+
+    participants = result['participants']
+    return {
+        'participants': participants[0]['value'] if participants else 0,
+        'results': [entry(row) for row in rows],
+        'me': entry(me) if me else None,
+    }
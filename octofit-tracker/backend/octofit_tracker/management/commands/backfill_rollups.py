@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from octofit_tracker import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily and weekly activity rollups from the activities collection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Activities read and aggregated per chunk')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        def progress(processed):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'  {processed} activities ({processed / elapsed:,.0f}/s)')
+
+        total = rollups.backfill(options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {total} activities in {time.perf_counter() - start:.1f}s'
+        ))
@@ -0,0 +1,166 @@
+import io
+import json
+import platform
+import random
+import re
+import time
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from octofit_tracker import benchmarks, indexes, querybudget
+from octofit_tracker.models import Activity, User
+from octofit_tracker.mongo import get_collection, get_database
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main API endpoints in process on deterministic datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', choices=sorted(benchmarks.SCALES), default=['small', 'medium'])
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per endpoint')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--backend', choices=['mongod', 'mongomock'], default='mongod',
+                            help='mongod uses the configured server; mongomock needs no server at all')
+        parser.add_argument('--database', default='octofit_benchmark',
+                            help='Scratch database the datasets are written to (dropped afterwards)')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Fail if results regress against this JSON file')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed latency growth against the baseline, as a fraction')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Ignore latency growth smaller than this')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as source:
+                baseline = json.load(source)['results']
+
+        if options['backend'] == 'mongomock':
+            try:
+                benchmarks.use_mongomock()
+            except ImportError:
+                raise CommandError('The mongomock backend requires the mongomock package.')
+        benchmarks.use_database(options['database'])
+
+        results = {}
+        self.over_budget = {}
+        try:
+            for scale in options['scales']:
+                self.seed(scale, options['seed'])
+                results[scale] = self.run_scale(scale, options)
+        finally:
+            get_database().client.drop_database(options['database'])
+
+        report = {
+            'meta': {
+                'backend': options['backend'],
+                # mongomock emits no command monitoring events.
+                'queries_counted': options['backend'] == 'mongod',
+                'seed': options['seed'],
+                'requests': options['requests'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = benchmarks.compare(
+                baseline, results, options['threshold'], options['min_delta_ms'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(self.style.ERROR(f'  {regression}'))
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+        if self.over_budget:
+            for case, report in self.over_budget.items():
+                self.stderr.write(self.style.ERROR(f'{case}: {report}'))
+            raise CommandError(f'{len(self.over_budget)} case(s) over their declared query budget')
+
+    def seed(self, scale, seed):
+        users, activities_per_user, teams = benchmarks.SCALES[scale]
+        self.stdout.write(f'Seeding {scale}: {users} users, ~{users * activities_per_user} activities...')
+        for model in indexes.app_models():
+            indexes.reconcile(model)
+        call_command(
+            'populate_db', users=users, activities_per_user=activities_per_user,
+            teams=teams, seed=seed, stdout=io.StringIO(),
+        )
+
+    def cases(self, rng):
+        user_ids = [str(user['_id']) for user in get_collection(User).find({}, {'_id': 1}).limit(500)]
+        activity_ids = [str(doc['_id']) for doc in get_collection(Activity).find({}, {'_id': 1}).limit(500)]
+
+        def new_activity():
+            return {
+                'user_id': rng.choice(user_ids),
+                'activity_type': 'Running',
+                'duration': rng.randint(10, 90),
+                'calories': rng.randint(50, 900),
+                'distance': round(rng.uniform(1, 15), 2),
+                'date': '2024-01-01T10:00:00Z',
+            }
+
+        def budget(path, method='GET'):
+            return querybudget.declared_budget(path, method, urlconf='octofit_tracker.urls')
+
+        # (name, declared query budget, call, response cache on). Cases time
+        # the query path; the *-cached ones report what a cache hit costs.
+        return [
+            ('users-list', budget('/api/users/'), lambda client: client.get('/api/users/'), False),
+            ('users-detail', budget(f'/api/users/{user_ids[0]}/'),
+             lambda client: client.get(f'/api/users/{rng.choice(user_ids)}/'), False),
+            ('activities-list', budget('/api/activities/'), lambda client: client.get('/api/activities/'), False),
+            ('activities-detail', budget(f'/api/activities/{activity_ids[0]}/'),
+             lambda client: client.get(f'/api/activities/{rng.choice(activity_ids)}/'), False),
+            ('activities-create', budget('/api/activities/', 'POST'),
+             lambda client: client.post('/api/activities/', new_activity(), format='json'), False),
+            ('leaderboard', budget('/api/leaderboard/'), lambda client: client.get('/api/leaderboard/'), False),
+            ('leaderboard-window', budget('/api/leaderboard/'),
+             lambda client: client.get('/api/leaderboard/', {'window': '7d'}), False),
+            ('dashboard', None, lambda client: client.get('/api/stats/'), False),
+            ('leaderboard-cached', budget('/api/leaderboard/'), lambda client: client.get('/api/leaderboard/'), True),
+            ('dashboard-cached', None, lambda client: client.get('/api/stats/'), True),
+        ]
+
+    def run_scale(self, scale, options):
+        client = APIClient(SERVER_NAME='localhost', HTTP_ACCEPT='application/json')
+        rng = random.Random(options['seed'])
+        results = {}
+        for name, budget, call, cached in self.cases(rng):
+            latencies, queries, errors = [], [], 0
+            with override_settings(API_CACHE_ENABLED=cached):
+                for _ in range(options['warmup']):
+                    call(client)
+                for _ in range(options['requests']):
+                    guard = querybudget.QueryBudget(budget if budget is not None else float('inf'), name, strict=False)
+                    start = time.perf_counter()
+                    with guard:
+                        response = call(client)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if guard.exceeded:
+                        self.over_budget.setdefault(f'{scale}/{name}', guard.report())
+                    errors += response.status_code >= 400
+                    match = QUERIES.search(response.get('Server-Timing', ''))
+                    if match:
+                        queries.append(int(match.group(1)))
+            results[name] = summary = benchmarks.summarize(latencies, queries, errors)
+            line = (
+                f"{scale:<7} {name:<19} p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms  "
+                f"p99 {summary['p99_ms']:8.2f} ms  {summary['queries_per_request']:6.2f} queries/req"
+            )
+            self.stdout.write(self.style.ERROR(line + f'  {errors} errors') if errors else line)
+        return results
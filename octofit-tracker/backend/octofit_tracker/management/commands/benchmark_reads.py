@@ -0,0 +1,76 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from octofit_tracker.views import UserViewSet, ActivityViewSet, LeaderboardViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare the djongo ORM read path with the native pymongo read path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        iterations = options['iterations']
+        page_size = options['page_size']
+
+        for name, viewset in (
+            ('users', UserViewSet),
+            ('activities', ActivityViewSet),
+            ('leaderboard', LeaderboardViewSet),
+        ):
+            list_view = viewset.as_view({'get': 'list'})
+            detail_view = viewset.as_view({'get': 'retrieve'})
+            lookup = viewset.lookup_url_kwarg or viewset.lookup_field
+            first = viewset.queryset.model.objects.first()
+
+            def call_list():
+                return list_view(factory.get(f'/api/{name}/', {'page_size': page_size}))
+
+            def call_detail():
+                return detail_view(factory.get(f'/api/{name}/{first._id}/'), **{lookup: str(first._id)})
+
+            cases = [('list', call_list)]
+            if first is not None:
+                cases.append(('detail', call_detail))
+
+            for action, call in cases:
+                timings = {}
+                bodies = {}
+                for native in (False, True):
+                    # Time the read paths, not cache hits.
+                    with override_settings(NATIVE_MONGO_READS=native, API_CACHE_ENABLED=False):
+                        bodies[native] = self._render(call())
+                        start = time.perf_counter()
+                        for _ in range(iterations):
+                            self._render(call())
+                        timings[native] = (time.perf_counter() - start) / iterations * 1000
+
+                same = self._comparable(bodies[False]) == self._comparable(bodies[True])
+                match = 'identical' if same else 'MISMATCH'
+                speedup = timings[False] / timings[True] if timings[True] else float('inf')
+                line = (
+                    f'{name:<12} {action:<7} orm {timings[False]:8.2f} ms  '
+                    f'native {timings[True]:8.2f} ms  x{speedup:5.2f}  output {match}'
+                )
+                style = self.style.SUCCESS if match == 'identical' else self.style.ERROR
+                self.stdout.write(style(line))
+
+    def _render(self, response):
+        if hasattr(response, 'render'):
+            response.render()
+        return response.content
+
+    def _comparable(self, content):
+        # Pagination links carry a cursor encoded differently by each path;
+        # only the rows (and the count, where a page has one) must agree.
+        body = json.loads(content)
+        if isinstance(body, dict) and 'results' in body:
+            return {key: body[key] for key in ('results', 'count') if key in body}
+        return body
@@ -0,0 +1,80 @@
+import random
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from octofit_tracker import synthetic
+from octofit_tracker.fast_serializers import compile_serializer
+from octofit_tracker.models import Activity, User
+from octofit_tracker.serializers import ActivitySerializer, UserSerializer
+
+
+class Command(BaseCommand):
+    help = 'Check that the compiled serializers match DRF byte for byte and measure the speedup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        largest = max(options['sizes'])
+        activities, users = self.build_rows(largest, options['seed'])
+
+        mismatches = 0
+        for label, rows, serializer_class in (
+            ('activities', activities, ActivitySerializer),
+            ('users', users, UserSerializer),
+        ):
+            instances = [row[0] for row in rows]
+            documents = [row[1] for row in rows]
+            for size in options['sizes']:
+                drf_time, drf_json = self.timed(
+                    lambda: renderer.render(serializer_class(instances[:size], many=True).data))
+                fast_time, fast_json = self.timed(
+                    lambda: renderer.render(compile_serializer(serializer_class).many(instances[:size])))
+                doc_time, doc_json = self.timed(
+                    lambda: renderer.render(compile_serializer(serializer_class, documents=True).many(documents[:size])))
+
+                identical = drf_json == fast_json == doc_json
+                mismatches += not identical
+                line = (
+                    f'{label:<10} {size:>7} rows  drf {drf_time * 1000:9.1f} ms  '
+                    f'fast {fast_time * 1000:8.1f} ms (x{drf_time / fast_time:5.1f})  '
+                    f'documents {doc_time * 1000:8.1f} ms (x{drf_time / doc_time:5.1f})  '
+                    f"{'identical' if identical else 'MISMATCH'}"
+                )
+                self.stdout.write(self.style.SUCCESS(line) if identical else self.style.ERROR(line))
+
+        if mismatches:
+            raise CommandError(f'{mismatches} size(s) produced different JSON')
+
+    def timed(self, func):
+        start = time.perf_counter()
+        result = func()
+        return time.perf_counter() - start, result
+
+    def build_rows(self, count, seed):
+        """Build unsaved model instances plus the equivalent raw documents."""
+        rng = random.Random(seed)
+        now = timezone.now().replace(microsecond=0)
+        anchor = synthetic.anchor_date()
+
+        users = []
+        for document in synthetic.generate_users(rng, count, ['Team 0001', 'Team 0002'], now):
+            users.append((User(**document), document))
+
+        activities = []
+        documents = (
+            activity
+            for user in users
+            for activity in synthetic.generate_activities(
+                rng, str(user[1]['_id']), 5, anchor, now, user[1]['weight'],
+            )
+        )
+        for document in islice(documents, count):
+            activities.append((Activity(**document), document))
+        return activities, users
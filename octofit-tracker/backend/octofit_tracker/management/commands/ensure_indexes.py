@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from octofit_tracker import indexes, search
+
+
+class Command(BaseCommand):
+    help = 'Create or reconcile the MongoDB indexes declared on the models'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true',
+                            help='Drop non-unique indexes that are not declared on the models')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would change')
+        parser.add_argument('--no-explain', action='store_true',
+                            help='Skip the explain() check for collection scans')
+
+    def handle(self, *args, **options):
+        changed = 0
+        for model in indexes.app_models():
+            for action, name in indexes.reconcile(model, prune=options['prune'], dry_run=options['dry_run']):
+                changed += 1
+                self.stdout.write(f'{model._meta.db_table}: {action} {name}')
+        for action, collection, name in search.ensure_text_indexes(dry_run=options['dry_run']):
+            changed += 1
+            self.stdout.write(f'{collection}: {action} {name}')
+        if changed:
+            self.stdout.write(self.style.SUCCESS(f'{changed} index change(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Indexes already up to date'))
+
+        if options['no_explain']:
+            return
+        scans = indexes.find_collection_scans()
+        for model_name, description in scans:
+            self.stdout.write(self.style.WARNING(f'COLLSCAN: {model_name} - {description}'))
+        if not scans:
+            self.stdout.write(self.style.SUCCESS('No collection scans in the known query patterns'))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from octofit_tracker import energy, leaderboard, rollups
+
+
+class Command(BaseCommand):
+    help = 'Estimate calories (from MET values) for activities that have none, or recompute every activity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recompute', action='store_true',
+                            help='Replace the calories of every activity, not only the missing ones')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Activities read, estimated and written per chunk')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count the activities that would change without writing')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Do not rebuild the leaderboard and rollups afterwards')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        def progress(scanned, updated):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'  {scanned} activities, {updated} changed ({scanned / elapsed:,.0f}/s)')
+
+        scanned, updated = energy.backfill(
+            recompute=options['recompute'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+            progress=progress,
+        )
+        verb = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{scanned} activities scanned, {updated} {verb} in {time.perf_counter() - start:.1f}s'
+        ))
+        if not updated or options['dry_run'] or options['skip_derived']:
+            return
+        self.stdout.write('Rebuilding leaderboard...')
+        leaderboard.rebuild()
+        self.stdout.write('Rebuilding activity rollups...')
+        rollups.backfill(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,52 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from octofit_tracker import export
+
+
+class Command(BaseCommand):
+    help = 'Stream activities to a file (or stdout) as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='output_format', choices=sorted(export.CONTENT_TYPES),
+                            default='ndjson', help='Output format (default: ndjson)')
+        parser.add_argument('--since', help='Only export activities created after this ISO date/datetime')
+        parser.add_argument('--output', '-o', default='-', help='Output path, or - for stdout (default)')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Documents per cursor batch (default: EXPORT_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = export.parse_since(options['since'])
+            except ValueError:
+                raise CommandError(f"Invalid --since value: {options['since']}")
+
+        chunks = export.export_activities(
+            options['output_format'], since=since,
+            batch_size=options['batch_size'], compress=options['gzip'],
+        )
+        start = time.perf_counter()
+        written = 0
+        if options['output'] == '-':
+            output = sys.stdout.buffer
+        else:
+            output = open(options['output'], 'wb')
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+            else:
+                output.flush()
+
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {written:,} bytes to {options['output']} in {time.perf_counter() - start:.1f}s"
+            ))
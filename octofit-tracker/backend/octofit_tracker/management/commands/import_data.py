@@ -0,0 +1,83 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from octofit_tracker import caching, importer, leaderboard, rollups
+
+
+class Command(BaseCommand):
+    help = 'Import activities, users or workouts from CSV or NDJSON files (optionally gzipped)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(importer.KINDS))
+        parser.add_argument('paths', nargs='+', help='.csv, .ndjson or .jsonl files, optionally .gz')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Records validated and written per bulk operation')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes validating and writing batches')
+        parser.add_argument('--checkpoint-dir',
+                            help='Where to keep checkpoints (default: next to each file)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore existing checkpoints and start from the first record')
+        parser.add_argument('--errors', help='Write rejected records as NDJSON to this file')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Do not rebuild the leaderboard and rollups afterwards')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        for path in options['paths']:
+            try:
+                importer.detect_format(path)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        errors = open(options['errors'], 'w') if options['errors'] else None
+        try:
+            for path in options['paths']:
+                self.import_file(kind, path, options, errors)
+        finally:
+            if errors:
+                errors.close()
+        # Written with pymongo, so the save signals did not fire.
+        caching.invalidate(importer.KINDS[kind][0])
+
+        if options['skip_derived']:
+            return
+        if kind in ('activities', 'users'):
+            self.stdout.write('Rebuilding leaderboard...')
+            leaderboard.rebuild()
+        if kind == 'activities':
+            self.stdout.write('Rebuilding activity rollups...')
+            rollups.backfill()
+        self.stdout.write(self.style.SUCCESS('Done'))
+
+    def import_file(self, kind, path, options, errors):
+        checkpoint = importer.checkpoint_path(path, options['checkpoint_dir'])
+        if options['restart']:
+            importer.save_checkpoint(checkpoint, importer.fingerprint(path), 0)
+        start = time.perf_counter()
+
+        def progress(records, result):
+            if errors:
+                for index, detail in result['errors']:
+                    errors.write(json.dumps({'file': path, 'record': index, 'errors': detail}) + '\n')
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'  {path}: {records} records ({records / elapsed:,.0f}/s)')
+
+        totals = importer.run_import(
+            path, kind,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            checkpoint=checkpoint,
+            progress=progress,
+        )
+        if totals['resumed_from']:
+            self.stdout.write(f"  resumed after record {totals['resumed_from']}")
+        for index, detail in totals['errors'][:10]:
+            self.stderr.write(f'  record {index}: {json.dumps(detail)}')
+        self.stdout.write(self.style.SUCCESS(
+            f"{path}: {totals['created']} created, {totals['updated']} updated, "
+            f"{totals['skipped']} skipped, {totals['failed']} failed "
+            f"in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,109 @@
+import asyncio
+import io
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent-request throughput of the ASGI (async) and WSGI applications in process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', nargs='+',
+                            default=['/api/activities/', '/api/leaderboard/', '/api/users/', '/api/stats/'])
+        parser.add_argument('--requests', type=int, default=400, help='Requests per path and mode')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once')
+        parser.add_argument('--wsgi-workers', type=int, default=4,
+                            help='Threads serving the WSGI application, like a sync worker pool')
+
+    def handle(self, *args, **options):
+        from octofit_tracker.asgi import application as asgi_application
+        from octofit_tracker.wsgi import application as wsgi_application
+
+        for path in options['paths']:
+            wsgi = self.run_wsgi(wsgi_application, path, options)
+            with override_settings(ROOT_URLCONF='octofit_tracker.async_urls'):
+                asgi = asyncio.run(self.run_asgi(asgi_application, path, options))
+            for mode, (elapsed, latencies, statuses) in (('wsgi', wsgi), ('asgi', asgi)):
+                ok = statuses.count(200)
+                self.stdout.write(
+                    f'{path:<20} {mode}  {len(latencies) / elapsed:8.1f} req/s  '
+                    f'p50 {self.percentile(latencies, 50):7.1f} ms  '
+                    f'p95 {self.percentile(latencies, 95):7.1f} ms  '
+                    f'{ok}/{len(statuses)} ok'
+                )
+
+    def percentile(self, values, pct):
+        if len(values) < 2:
+            return values[0] if values else 0.0
+        return statistics.quantiles(values, n=100)[pct - 1]
+
+    def run_wsgi(self, application, path, options):
+        def call(queued_at):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'HTTP_ACCEPT': 'application/json', 'wsgi.url_scheme': 'http',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(),
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+                'wsgi.version': (1, 0),
+            }
+            status = []
+            body = application(environ, lambda s, headers, exc_info=None: status.append(int(s[:3])))
+            b''.join(body)
+            if hasattr(body, 'close'):
+                body.close()
+            return (time.perf_counter() - queued_at) * 1000, status[0]
+
+        # Only `concurrency` requests are in flight, as in the ASGI run; those
+        # beyond the worker count wait for a free thread, and their latency
+        # includes that wait, as it would in front of a sync server.
+        semaphore = threading.BoundedSemaphore(options['concurrency'])
+
+        def submit(pool):
+            semaphore.acquire()
+            future = pool.submit(call, time.perf_counter())
+            future.add_done_callback(lambda _: semaphore.release())
+            return future
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['wsgi_workers']) as pool:
+            futures = [submit(pool) for _ in range(options['requests'])]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+        return elapsed, [duration for duration, _ in results], [status for _, status in results]
+
+    async def run_asgi(self, application, path, options):
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def call():
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '',
+                'headers': [(b'host', b'localhost'), (b'accept', b'application/json')],
+                'server': ('localhost', 80), 'client': ('127.0.0.1', 50000),
+            }
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            async with semaphore:
+                start = time.perf_counter()
+                await application(scope, receive, send)
+                duration = (time.perf_counter() - start) * 1000
+            status = next(m['status'] for m in messages if m['type'] == 'http.response.start')
+            return duration, status
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(call() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        return elapsed, [duration for duration, _ in results], [status for _, status in results]
@@ -1,25 +1,124 @@
+import time
+
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from octofit_tracker.models import User, Team, Activity, Leaderboard, Workout
-from datetime import datetime, timedelta
+from octofit_tracker import caching, energy, leaderboard, rollups, synthetic
+from octofit_tracker.models import User, Team, Activity, Leaderboard, Workout, ActivityRollup
+from octofit_tracker.mongo import get_collection
+from datetime import date, datetime, timedelta
 import random
 
 
 class Command(BaseCommand):
     help = 'Populate the octofit_db database with test data'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0,
+                            help='Generate this many synthetic users instead of the hero dataset')
+        parser.add_argument('--activities-per-user', type=int, default=20,
+                            help='Mean number of activities per synthetic user')
+        parser.add_argument('--teams', type=int, default=10,
+                            help='Number of synthetic teams')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Random seed, so repeated runs produce the same data')
+        parser.add_argument('--anchor-date', type=date.fromisoformat, default=None,
+                            help='Date (YYYY-MM-DD) synthetic activities lead up to; defaults to today')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Documents per insert_many call')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
         self.stdout.write('Deleting existing data...')
         
         # Delete existing data
-        User.objects.all().delete()
-        Team.objects.all().delete()
-        Activity.objects.all().delete()
-        Leaderboard.objects.all().delete()
-        Workout.objects.all().delete()
+        for model in (User, Team, Activity, Leaderboard, Workout, ActivityRollup):
+            get_collection(model).delete_many({})
         
         self.stdout.write(self.style.SUCCESS('Existing data deleted'))
 
+        if options['users']:
+            users_count, teams_count, activities_count = self.create_synthetic(options)
+        else:
+            users_count, teams_count, activities_count = self.create_heroes()
+
+            # Create Leaderboard entries
+            self.stdout.write('Creating leaderboard...')
+            entries = leaderboard.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Created {entries} leaderboard entries'))
+
+        self.stdout.write('Building activity rollups...')
+        rollups.backfill(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Activity rollups built'))
+
+        workouts_count = self.create_workouts()
+        # Written with pymongo, so the save signals did not fire.
+        for model in (User, Team, Activity, Workout):
+            caching.invalidate(model)
+
+        self.stdout.write(self.style.SUCCESS('Database population completed successfully!'))
+        self.stdout.write(self.style.SUCCESS(f'Total users: {users_count}'))
+        self.stdout.write(self.style.SUCCESS(f'Total teams: {teams_count}'))
+        self.stdout.write(self.style.SUCCESS(f'Total activities: {activities_count}'))
+        self.stdout.write(self.style.SUCCESS(f'Total workouts: {workouts_count}'))
+
+    def create_synthetic(self, options):
+        batch_size = options['batch_size']
+        now = timezone.now()
+        anchor = synthetic.anchor_date(options['anchor_date'])
+
+        self.stdout.write(f"Generating {options['teams']} teams...")
+        teams = list(synthetic.generate_teams(self.rng, options['teams'], now))
+        synthetic.write_stream(get_collection(Team), teams, batch_size)
+        team_names = [team['name'] for team in teams]
+
+        self.stdout.write(f"Generating {options['users']} users (seed {options['seed']})...")
+        users_collection = get_collection(User)
+        activities_collection = get_collection(Activity)
+        totals = []
+        users_count = activities_count = 0
+        start = time.perf_counter()
+
+        users = synthetic.generate_users(self.rng, options['users'], team_names, now)
+        for chunk in synthetic.chunked(users, batch_size):
+            users_collection.insert_many(chunk, ordered=False)
+            users_count += len(chunk)
+
+            def activities():
+                for user in chunk:
+                    user_id = str(user['_id'])
+                    calories = count = 0
+                    for activity in synthetic.generate_activities(
+                        self.rng, user_id, options['activities_per_user'], anchor, now, user['weight'],
+                    ):
+                        calories += activity['calories']
+                        count += 1
+                        yield activity
+                    if count:
+                        totals.append({
+                            'user_id': user_id,
+                            'user_name': user['name'],
+                            'team': user['team'] or '',
+                            'total_calories': calories,
+                            'total_activities': count,
+                        })
+
+            activities_count += synthetic.write_stream(activities_collection, activities(), batch_size)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'  {users_count} users, {activities_count} activities '
+                f'({(users_count + activities_count) / elapsed:,.0f} docs/s)'
+            )
+
+        self.stdout.write('Creating leaderboard...')
+        entries = leaderboard.write_entries(totals, batch_size)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {entries} leaderboard entries; '
+            f'{users_count + activities_count + entries:,} documents in {elapsed:.1f}s'
+        ))
+        return users_count, len(teams), activities_count
+
+    def create_heroes(self):
         # Create Teams
         self.stdout.write('Creating teams...')
         team_marvel = Team.objects.create(
@@ -80,12 +179,12 @@ class Command(BaseCommand):
         
         for user in all_users:
             # Create 5-10 activities per user
-            num_activities = random.randint(5, 10)
+            num_activities = self.rng.randint(5, 10)
             for i in range(num_activities):
-                activity_type = random.choice(activity_types)
-                duration = random.randint(20, 120)
-                calories = duration * random.randint(5, 15)
-                distance = round(random.uniform(1, 20), 2) if activity_type in ['Running', 'Cycling', 'Swimming'] else None
+                activity_type = self.rng.choice(activity_types)
+                duration = self.rng.randint(20, 120)
+                distance = round(self.rng.uniform(1, 20), 2) if activity_type in ['Running', 'Cycling', 'Swimming'] else None
+                calories = energy.estimate(activity_type, duration, distance, user.weight)
                 
                 Activity.objects.create(
                     user_id=str(user._id),
@@ -93,42 +192,15 @@ class Command(BaseCommand):
                     duration=duration,
                     calories=calories,
                     distance=distance,
-                    date=timezone.now() - timedelta(days=random.randint(0, 30))
+                    date=timezone.now() - timedelta(days=self.rng.randint(0, 30))
                 )
                 activities_count += 1
 
         self.stdout.write(self.style.SUCCESS(f'Created {activities_count} activities'))
 
-        # Create Leaderboard entries
-        self.stdout.write('Creating leaderboard...')
-        leaderboard_data = []
-        
-        for user in all_users:
-            user_activities = Activity.objects.filter(user_id=str(user._id))
-            total_calories = sum(activity.calories for activity in user_activities)
-            total_activities = user_activities.count()
-            
-            leaderboard_data.append({
-                'user': user,
-                'total_calories': total_calories,
-                'total_activities': total_activities
-            })
-
-        # Sort by total calories and assign ranks
-        leaderboard_data.sort(key=lambda x: x['total_calories'], reverse=True)
-        
-        for idx, data in enumerate(leaderboard_data, start=1):
-            Leaderboard.objects.create(
-                user_id=str(data['user']._id),
-                user_name=data['user'].name,
-                team=data['user'].team,
-                total_calories=data['total_calories'],
-                total_activities=data['total_activities'],
-                rank=idx
-            )
-
-        self.stdout.write(self.style.SUCCESS(f'Created {len(leaderboard_data)} leaderboard entries'))
+        return len(all_users), 2, activities_count
 
+    def create_workouts(self):
         # Create Workouts
         self.stdout.write('Creating workouts...')
         workouts_data = [
@@ -219,8 +291,4 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS(f'Created {len(workouts_data)} workouts'))
 
-        self.stdout.write(self.style.SUCCESS('Database population completed successfully!'))
-        self.stdout.write(self.style.SUCCESS(f'Total users: {len(all_users)}'))
-        self.stdout.write(self.style.SUCCESS(f'Total teams: 2'))
-        self.stdout.write(self.style.SUCCESS(f'Total activities: {activities_count}'))
-        self.stdout.write(self.style.SUCCESS(f'Total workouts: {len(workouts_data)}'))
+        return len(workouts_data)
@@ -0,0 +1,51 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from octofit_tracker import recommendations
+from octofit_tracker.models import User
+from octofit_tracker.mongo import get_collection
+from octofit_tracker.synthetic import chunked
+
+
+class Command(BaseCommand):
+    help = 'Recommend workouts to every user (NDJSON, one user per line), e.g. for the nightly emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=3, help='Workouts per user')
+        parser.add_argument('--days', type=int, default=recommendations.HISTORY_DAYS,
+                            help='Days of activity history to take into account')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users scored per matrix product')
+        parser.add_argument('--output', '-o', default='-', help='Output path, or - for stdout (default)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        projection = dict.fromkeys(recommendations.PROFILE_FIELDS + ('name', 'email'), 1)
+        users = get_collection(User).find({}, projection, batch_size=options['batch_size']).sort('_id', 1)
+        output = self.stdout if options['output'] == '-' else open(options['output'], 'w')
+        count = 0
+        try:
+            for batch in chunked(users, options['batch_size']):
+                ranked = recommendations.recommend_many(batch, options['limit'], options['days'])
+                for user in batch:
+                    user_id = str(user['_id'])
+                    output.write(json.dumps({
+                        'user_id': user_id,
+                        'name': user.get('name'),
+                        'email': user.get('email'),
+                        'workouts': [
+                            {'_id': str(workout['_id']), 'name': workout['name'], 'score': round(score, 3)}
+                            for workout, score in ranked[user_id]
+                        ],
+                    }) + '\n')
+                count += len(batch)
+        finally:
+            if output is not self.stdout:
+                output.close()
+
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote recommendations for {count:,} users to {options['output']} "
+                f"in {time.perf_counter() - start:.1f}s"
+            ))
@@ -0,0 +1,40 @@
+# Generated by Django 4.1.7 on 2026-10-18 03:01
+
+from django.db import migrations, models
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0003_model_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('_id', djongo.models.fields.ObjectIdField(auto_created=True, primary_key=True, serialize=False)),
+                ('scope', models.CharField(choices=[('user', 'User'), ('team', 'Team')], max_length=10)),
+                ('key', models.CharField(max_length=100)),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=10)),
+                ('start', models.DateTimeField()),
+                ('activities', models.IntegerField(default=0)),
+                ('duration', models.IntegerField(default=0)),
+                ('calories', models.IntegerField(default=0)),
+                ('distance', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'activity_rollups',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='activityrollup',
+            index=models.Index(fields=['scope', 'period', 'start'], name='rollups_period_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='activityrollup',
+            constraint=models.UniqueConstraint(fields=('scope', 'key', 'period', 'start'), name='rollups_bucket_uniq'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0004_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='activity',
+            name='activities_user_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='activity',
+            name='activities_type_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['user_id', 'date', '_id'], name='activities_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['activity_type', 'date', '_id'], name='activities_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['user_id', 'calories', '_id'], name='activities_user_calories_idx'),
+        ),
+    ]
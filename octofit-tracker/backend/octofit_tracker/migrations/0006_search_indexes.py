@@ -0,0 +1,43 @@
+# Generated by Django 4.1.7 on 2026-10-18 03:28
+
+from django.db import migrations, models
+
+# Frozen copy of search.TEXT_INDEXES; ensure_indexes rebuilds them if it changes.
+TEXT_INDEXES = {
+    'users': {'name': 10, 'team': 3, 'email': 2},
+    'workouts': {'name': 10, 'activity_type': 3, 'description': 1},
+}
+
+
+def create_text_indexes(apps, schema_editor):
+    database = schema_editor.connection.connection
+    for table, weights in TEXT_INDEXES.items():
+        database[table].create_index(
+            [(field, 'text') for field in weights], name=f'{table}_text_idx', weights=weights,
+            default_language='none', background=True,
+        )
+
+
+def drop_text_indexes(apps, schema_editor):
+    database = schema_editor.connection.connection
+    for table in TEXT_INDEXES:
+        database[table].drop_index(f'{table}_text_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0005_activity_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['name'], name='users_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['name'], name='workouts_name_idx'),
+        ),
+        migrations.RunPython(create_text_indexes, drop_text_indexes),
+    ]
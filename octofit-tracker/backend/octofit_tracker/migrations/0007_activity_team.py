@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0006_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='team',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+    ]
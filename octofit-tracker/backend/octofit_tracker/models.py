@@ -26,6 +26,12 @@ class User(models.Model):
 
     class Meta:
         db_table = 'users'
+        indexes = [
+            models.Index(fields=['team'], name='users_team_idx'),
+            models.Index(fields=['created_at'], name='users_created_at_idx'),
+            # Name prefix search; see search
+            models.Index(fields=['name'], name='users_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -52,10 +58,22 @@ class Activity(models.Model):
     calories = models.IntegerField()
     distance = models.FloatField(null=True, blank=True)  # in km
     date = models.DateTimeField()
+    # The user's team when the activity was logged ('' for none); see rollups
+    team = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'activities'
+        # MongoDB walks an index in either direction, so ascending keys
+        # also serve the descending date sorts used by the API. The trailing
+        # _id serves the tie-breaker of the keyset pagination (see filters).
+        indexes = [
+            models.Index(fields=['user_id', 'date', '_id'], name='activities_user_date_idx'),
+            models.Index(fields=['date', '_id'], name='activities_date_idx'),
+            models.Index(fields=['activity_type', 'date', '_id'], name='activities_type_date_idx'),
+            models.Index(fields=['user_id', 'calories', '_id'], name='activities_user_calories_idx'),
+            models.Index(fields=['created_at'], name='activities_created_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.activity_type} - {self.duration} mins"
@@ -73,6 +91,12 @@ class Leaderboard(models.Model):
 
     class Meta:
         db_table = 'leaderboard'
+        indexes = [
+            models.Index(fields=['rank'], name='leaderboard_rank_idx'),
+            models.Index(fields=['user_id'], name='leaderboard_user_idx'),
+            models.Index(fields=['total_calories'], name='leaderboard_calories_idx'),
+            models.Index(fields=['team', 'total_calories'], name='leaderboard_team_cal_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user_name} - Rank {self.rank}"
@@ -90,6 +114,36 @@ class Workout(models.Model):
 
     class Meta:
         db_table = 'workouts'
+        indexes = [
+            models.Index(fields=['activity_type', 'difficulty'], name='workouts_type_diff_idx'),
+            models.Index(fields=['name'], name='workouts_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class ActivityRollup(models.Model):
+    """Pre-aggregated activity totals for one user or team over a day or week."""
+    _id = models.ObjectIdField()
+    scope = models.CharField(max_length=10, choices=[('user', 'User'), ('team', 'Team')])
+    key = models.CharField(max_length=100)  # user_id or team name
+    period = models.CharField(max_length=10, choices=[('day', 'Day'), ('week', 'Week')])
+    start = models.DateTimeField()  # bucket start, UTC midnight (Monday for weeks)
+    activities = models.IntegerField(default=0)
+    duration = models.IntegerField(default=0)  # in minutes
+    calories = models.IntegerField(default=0)
+    distance = models.FloatField(default=0)  # in km
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'activity_rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key', 'period', 'start'], name='rollups_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['scope', 'period', 'start'], name='rollups_period_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} - {self.period} {self.start:%Y-%m-%d}"
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.utils import timezone
+from pymongo import ReadPreference
+from pymongo.errors import PyMongoError
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+READ_PREFERENCES = {
+    'primary': ReadPreference.PRIMARY,
+    'primaryPreferred': ReadPreference.PRIMARY_PREFERRED,
+    'secondary': ReadPreference.SECONDARY,
+    'secondaryPreferred': ReadPreference.SECONDARY_PREFERRED,
+    'nearest': ReadPreference.NEAREST,
+}
+
+
+def get_database(alias='default'):
+    """Return the pymongo Database behind djongo's connection."""
+    connection = connections[alias]
+    connection.ensure_connection()
+    return connection.connection
+
+
+def read_preference():
+    """The ``MONGO_READ_PREFERENCE`` setting as a pymongo read preference."""
+    name = getattr(settings, 'MONGO_READ_PREFERENCE', 'primary')
+    if name not in READ_PREFERENCES:
+        raise ImproperlyConfigured(
+            f'MONGO_READ_PREFERENCE must be one of: {", ".join(READ_PREFERENCES)}.')
+    return READ_PREFERENCES[name]
+
+
+def _with_read_preference(collection, read_only):
+    preference = read_preference() if read_only else ReadPreference.PRIMARY
+    if preference == ReadPreference.PRIMARY:
+        return collection
+    return collection.with_options(read_preference=preference)
+
+
+def get_collection(model, alias='default', read_only=False):
+    """``read_only`` collections follow ``MONGO_READ_PREFERENCE`` (use them for lag-tolerant reads)."""
+    return _with_read_preference(get_database(alias)[model._meta.db_table], read_only)
+
+
+def warm_up(alias='default'):
+    """Connect, ping the server and open ``minPoolSize`` connections.
+
+    Called when a worker starts so the first requests do not pay for
+    connection setup. Returns whether the server answered; a failure is
+    logged and left to the request path (and its timeouts) to report.
+    """
+    options = connections[alias].settings_dict.get('CLIENT', {})
+    try:
+        database = get_database(alias)
+        database.command('ping')
+        # Concurrent pings each check out their own connection.
+        connections_wanted = options.get('minPoolSize', 0)
+        if connections_wanted > 1:
+            with ThreadPoolExecutor(connections_wanted) as executor:
+                list(executor.map(lambda _: database.command('ping'), range(connections_wanted)))
+    except PyMongoError as exc:
+        logger.error('MongoDB warm-up failed: %s', exc)
+        return False
+    return True
+
+
+# Motor clients are bound to the event loop they were first used on.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_database(alias='default'):
+    """Return a motor database for the running event loop."""
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient
+    except ImportError as exc:
+        # motor 2.5 fails to import on Python 3.11+ (no asyncio.coroutine).
+        raise ImproperlyConfigured(
+            'The async API requires the motor package (motor 2.5 needs Python 3.10 or older).'
+        ) from exc
+
+    settings_dict = connections[alias].settings_dict
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if alias not in clients:
+        clients[alias] = AsyncIOMotorClient(**settings_dict.get('CLIENT', {}))
+    return clients[alias][settings_dict['NAME']]
+
+
+def get_async_collection(model, alias='default', read_only=False):
+    return _with_read_preference(get_async_database(alias)[model._meta.db_table], read_only)
+
+
+def to_object_id(value):
+    """Convert a hex string to an ObjectId, returning None when invalid."""
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def to_document(model, values):
+    """Map validated serializer data (field names) to document keys (columns)."""
+    return {model._meta.get_field(name).column: value for name, value in values.items()}
+
+
+_datetime_field = serializers.DateTimeField()
+
+
+def serialize_document(document):
+    """Render a raw document the way the model serializers render instances."""
+    data = {}
+    for key, value in document.items():
+        if isinstance(value, ObjectId):
+            value = str(value)
+        elif isinstance(value, datetime):
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value, dt_timezone.utc)
+            value = _datetime_field.to_representation(value)
+        data[key] = value
+    return data
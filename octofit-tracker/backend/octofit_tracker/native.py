@@ -0,0 +1,72 @@
+"""Read path that queries MongoDB directly instead of going through djongo.
+
+djongo turns every ORM query into SQL and parses it back into a Mongo
+query. For the hot list and detail endpoints ``NativeReadMixin`` skips that
+round trip and runs ``find`` on the pooled ``MongoClient``, rendering the raw
+documents with the compiled form of the viewset's serializer. It is enabled
+with the ``NATIVE_MONGO_READS`` setting; writes always go through the ORM.
+"""
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from .fast_serializers import compile_serializer
+from .mongo import get_collection, to_object_id
+from .pagination import sort_spec
+
+
+class NativeReadMixin:
+    """Serve ``list`` and ``retrieve`` straight from the Mongo collection."""
+    not_found_message = None
+    # Follow MONGO_READ_PREFERENCE; for data that may lag behind writes.
+    secondary_reads = False
+
+    def use_native_reads(self):
+        return getattr(settings, 'NATIVE_MONGO_READS', False)
+
+    def get_native_collection(self):
+        return get_collection(self.queryset.model, read_only=self.secondary_reads)
+
+    def get_document_filter(self):
+        """Mongo filter requested by the query string; ``None`` when unfiltered.
+
+        Filtered lists are always served from the collection.
+        """
+        return None
+
+    def get_document_projection(self):
+        """Projection for the documents read; ``None`` reads whole documents."""
+        return None
+
+    def list(self, request, *args, **kwargs):
+        query = self.get_document_filter()
+        if query is None and not self.use_native_reads():
+            return super().list(request, *args, **kwargs)
+
+        query = query or {}
+        collection = self.get_native_collection()
+        projection = self.get_document_projection()
+        serializer = compile_serializer(
+            self.get_serializer_class(), documents=True, fields=getattr(self, 'fieldset', None))
+        if self.paginator is None:
+            ordering = getattr(self, 'cursor_ordering', ('-_id',))
+            documents = collection.find(query, projection).sort(sort_spec(ordering))
+            return Response(serializer.many(documents))
+
+        documents = self.paginator.paginate_documents(collection, query, request, self, projection)
+        return self.paginator.get_document_paginated_response(serializer.many(documents))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_native_reads():
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        object_id = to_object_id(self.kwargs[lookup_url_kwarg])
+        document = None
+        if object_id is not None:
+            document = self.get_native_collection().find_one({'_id': object_id}, self.get_document_projection())
+        if document is None:
+            raise NotFound(self.not_found_message)
+        serializer = compile_serializer(
+            self.get_serializer_class(), documents=True, fields=getattr(self, 'fieldset', None))
+        return Response(serializer.to_representation(document))
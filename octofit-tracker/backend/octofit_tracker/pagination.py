@@ -0,0 +1,116 @@
+from collections import OrderedDict
+
+from bson import json_util
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+from rest_framework.response import Response
+
+from .mongo import to_object_id
+
+
+def sort_spec(ordering, reverse=False):
+    """Translate Django-style ordering strings into a pymongo sort list."""
+    spec = []
+    for field in ordering:
+        direction = -1 if field.startswith('-') else 1
+        spec.append((field.lstrip('-'), -direction if reverse else direction))
+    return spec
+
+
+def _after(spec, values):
+    """Filter matching documents that sort strictly after ``values``."""
+    clauses = []
+    for index, (field, direction) in enumerate(spec):
+        clause = {name: values[i] for i, (name, _) in enumerate(spec[:index])}
+        clause[field] = {'$gt' if direction == 1 else '$lt': values[index]}
+        clauses.append(clause)
+    return {'$or': clauses}
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Cursor pagination that filters on the sort key instead of skipping rows.
+
+    Each page is fetched with a ``<field> > <last value>`` filter, so deep
+    pages cost the same as the first one. Views pick their sort key through
+    a ``cursor_ordering`` attribute; the trailing ``_id`` keeps the order
+    stable when the leading field has ties.
+    """
+    ordering = ('-_id',)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering is None:
+            return super().get_ordering(request, queryset, view)
+        return tuple(ordering)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        # DRF's queryset path filters on the position as encoded, a hex string
+        # for ``_id``; djongo does not convert it, so it would match nothing.
+        # Document positions are JSON lists and never parse as an ObjectId.
+        if cursor is not None and self.ordering and self.ordering[0].lstrip('-') == '_id':
+            object_id = to_object_id(cursor.position)
+            if object_id is not None:
+                cursor = cursor._replace(position=object_id)
+        return cursor
+
+    def paginate_documents(self, collection, query, request, view=None, projection=None):
+        """Paginate a raw collection with a compound keyset over every ordering field.
+
+        The cursor position holds the values of all ordering fields, so ties
+        on the leading field are resolved without an offset.
+        """
+        query, spec, limit = self.document_query(query, request, view)
+        return self.document_page(list(collection.find(query, projection).sort(spec).limit(limit)))
+
+    def document_query(self, query, request, view=None):
+        """Return the ``(filter, sort, limit)`` to run for the requested page."""
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, None, view)
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor.reverse)
+
+        spec = sort_spec(self.ordering, self.reverse)
+        if self.cursor and self.cursor.position is not None:
+            try:
+                values = json_util.loads(self.cursor.position)
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if not isinstance(values, list) or len(values) != len(spec):
+                raise NotFound(self.invalid_cursor_message)
+            query = {'$and': [query, _after(spec, values)]} if query else _after(spec, values)
+        return query, spec, self.page_size + 1
+
+    def document_page(self, documents):
+        """Trim the fetched documents to a page and work out the links."""
+        has_more = len(documents) > self.page_size
+        documents = documents[:self.page_size]
+        if self.reverse:
+            documents.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, self.cursor is not None
+
+        self.next_url = self.previous_url = None
+        if documents and has_next:
+            self.next_url = self.encode_cursor(Cursor(0, False, self._document_position(documents[-1])))
+        if documents and has_previous:
+            self.previous_url = self.encode_cursor(Cursor(0, True, self._document_position(documents[0])))
+        return documents
+
+    def get_document_page_data(self, data):
+        return OrderedDict([
+            ('next', self.next_url),
+            ('previous', self.previous_url),
+            ('results', data),
+        ])
+
+    def get_document_paginated_response(self, data):
+        return Response(self.get_document_page_data(data))
+
+    def _document_position(self, document):
+        return json_util.dumps([document.get(field.lstrip('-')) for field in self.ordering])
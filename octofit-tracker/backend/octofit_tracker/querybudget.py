@@ -0,0 +1,156 @@
+"""Query budgets: fail when a block of code issues too many MongoDB commands.
+
+``QueryBudget`` counts the commands started while it is active, through
+pymongo's command monitoring, so djongo's ORM queries are counted along
+with direct collection access. It works as a context manager and as a
+decorator (test methods, management command handlers)::
+
+    with QueryBudget(3, label='activity list'):
+        client.get('/api/activities/')
+
+Leaving the block over budget raises ``QueryBudgetExceeded``, whose message
+lists the commands grouped by fingerprint: command, collection and the shape
+of the filter with values replaced by ``?``. A fingerprint repeated once per
+row is the signature of an N+1 query.
+
+Viewsets declare the budget of each action in ``query_budgets``; tests and
+``benchmark_api`` check requests against it with ``declared_budget``.
+
+mongomock emits no monitoring events, so budgets only bite against mongod.
+"""
+import contextvars
+import json
+from collections import Counter
+from contextlib import ContextDecorator
+
+from django.urls import Resolver404, resolve
+from pymongo import monitoring
+
+_active = contextvars.ContextVar('octofit_query_budgets', default=())
+
+# Connection housekeeping, not queries issued by the code under test.
+IGNORED_COMMANDS = frozenset({
+    'endSessions', 'hello', 'isMaster', 'ismaster', 'killCursors', 'ping',
+    'saslContinue', 'saslStart',
+})
+FILTER_KEYS = ('filter', 'query', 'q')
+BATCH_KEYS = ('updates', 'deletes')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def shape(value):
+    """``value`` with every literal replaced by ``?`` (lists of literals by ``[?]``)."""
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if any(isinstance(item, dict) for item in value):
+            return [shape(item) for item in value]
+        return '[?]'
+    return '?'
+
+
+def _filter_shape(command):
+    for key in FILTER_KEYS:
+        if key in command:
+            return shape(command[key])
+    for key in BATCH_KEYS:
+        if command.get(key):
+            return shape(command[key][0].get('q', {}))
+    if 'pipeline' in command:
+        stages = []
+        for stage in command['pipeline']:
+            name = next(iter(stage))
+            stages.append({name: shape(stage[name])} if name == '$match' else name)
+        return stages
+    return None
+
+
+def fingerprint(command_name, command):
+    """``find activities {"user_id": "?"}``-style description of a command."""
+    target = command.get(command_name)
+    collection = target if isinstance(target, str) else command.get('collection', '')
+    parts = [command_name, collection]
+    detail = _filter_shape(command)
+    if detail is not None:
+        parts.append(json.dumps(detail, sort_keys=True, default=str))
+    return ' '.join(part for part in parts if part)
+
+
+class QueryBudget(ContextDecorator):
+    """Allow at most ``limit`` MongoDB commands; see the module docstring.
+
+    With ``strict=False`` nothing is raised and the caller checks
+    ``exceeded`` and ``report()`` itself.
+    """
+
+    def __init__(self, limit, label=None, strict=True):
+        self.limit = limit
+        self.label = label
+        self.strict = strict
+        self.fingerprints = []
+
+    @property
+    def count(self):
+        return len(self.fingerprints)
+
+    @property
+    def exceeded(self):
+        return self.count > self.limit
+
+    def record(self, fingerprint):
+        self.fingerprints.append(fingerprint)
+
+    def __enter__(self):
+        self.fingerprints = []
+        self._token = _active.set(_active.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active.reset(self._token)
+        if exc_type is None and self.strict and self.exceeded:
+            raise QueryBudgetExceeded(self.report())
+        return False
+
+    def report(self):
+        label = f' for {self.label}' if self.label else ''
+        lines = [f'{self.count} MongoDB commands{label}, budget {self.limit}:']
+        for fingerprint, count in Counter(self.fingerprints).most_common():
+            lines.append(f'  {count:>4} x {fingerprint}')
+        return '\n'.join(lines)
+
+
+class BudgetListener(monitoring.CommandListener):
+    """Feed every command to the budgets active in the issuing context."""
+
+    def started(self, event):
+        budgets = _active.get()
+        if not budgets or event.command_name in IGNORED_COMMANDS:
+            return
+        key = fingerprint(event.command_name, event.command)
+        for budget in budgets:
+            budget.record(key)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def declared_budget(path, method='GET', urlconf=None):
+    """The ``query_budgets`` entry of the viewset action serving ``method path``.
+
+    ``None`` when the path is not a viewset route or declares no budget.
+    """
+    try:
+        match = resolve(path.split('?', 1)[0], urlconf)
+    except Resolver404:
+        return None
+    actions = getattr(match.func, 'actions', None)
+    if not actions:
+        return None
+    action = actions.get(method.lower())
+    return getattr(match.func.cls, 'query_budgets', {}).get(action)
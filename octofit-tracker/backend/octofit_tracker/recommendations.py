@@ -0,0 +1,182 @@
+"""Workout recommendations from a user's profile and recent activity mix.
+
+Workouts are encoded once into a feature matrix: per workout, a one-hot
+activity type, then difficulty, duration and intensity (kcal per minute),
+each scaled to 0..1. The matrix is cached in the process and rebuilt only
+when the Workout cache generation changes, i.e. after workouts are
+written (see ``caching``).
+
+A user becomes preferences over the same columns:
+- type affinities, mixing the types they logged in the last ``HISTORY_DAYS``
+  with those that suit their fitness goal;
+- how much the goal values duration and intensity;
+- a target difficulty from their weekly training volume, age and BMI.
+
+Scoring every workout is one matrix product minus the distance to the
+target difficulty; overshooting it costs more than undershooting.
+``recommend_many`` scores a whole batch of users in a single product,
+which is what the nightly ``recommend_workouts`` command uses.
+"""
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from . import caching
+from .models import Activity, Workout
+from .mongo import get_collection
+from .search import normalize
+
+HISTORY_DAYS = 28
+PROFILE_FIELDS = ('_id', 'weight', 'height', 'age', 'fitness_goal')
+DIFFICULTY_LEVELS = {
+    'beginner': 0.0, 'easy': 0.0,
+    'intermediate': 0.5, 'medium': 0.5,
+    'advanced': 1.0, 'hard': 1.0,
+}
+MAX_DURATION = 120  # minutes; longer workouts count as 1
+MAX_INTENSITY = 15.0  # kcal per minute
+TRAINED_MINUTES = 300  # per week, for a target difficulty of 1
+BASE_DIFFICULTY = 0.25  # target of a user without recent activity
+# Normalized goal: (type affinities, weight on duration, weight on intensity)
+GOALS = {
+    'perder peso': ({'Running': 1.0, 'Cycling': 0.8, 'Swimming': 0.8, 'Boxing': 0.8}, 0.3, 1.0),
+    'ganhar massa': ({'Weightlifting': 1.0, 'Boxing': 0.4}, 0.2, 0.4),
+    'melhorar resistencia': ({'Running': 1.0, 'Cycling': 1.0, 'Swimming': 1.0}, 1.0, 0.3),
+    'manter a forma': ({}, 0.4, 0.4),
+}
+GOALS.update({
+    'lose weight': GOALS['perder peso'],
+    'gain muscle': GOALS['ganhar massa'],
+    'improve endurance': GOALS['melhorar resistencia'],
+    'stay fit': GOALS['manter a forma'],
+})
+DEFAULT_GOAL = GOALS['manter a forma']
+HISTORY_WEIGHT = 0.6  # of the type affinity; the goal gets the rest
+# Per unit of difficulty above and below the user's target
+HARDER_PENALTY = 1.5
+EASIER_PENALTY = 0.5
+
+
+def _ratio(value, limit):
+    return min(max(float(value or 0) / limit, 0.0), 1.0)
+
+
+class WorkoutMatrix:
+    """Feature matrix of every workout; see the module docstring."""
+
+    def __init__(self, workouts):
+        self.workouts = list(workouts)
+        self.types = sorted({workout['activity_type'] for workout in self.workouts})
+        column = {activity_type: index for index, activity_type in enumerate(self.types)}
+        self.type_onehot = np.zeros((len(self.workouts), len(self.types)))
+        for row, workout in enumerate(self.workouts):
+            self.type_onehot[row, column[workout['activity_type']]] = 1.0
+        self.difficulty = np.array([
+            DIFFICULTY_LEVELS.get(str(workout.get('difficulty', '')).lower(), 0.5) for workout in self.workouts
+        ])
+        self.traits = np.array([
+            (_ratio(workout.get('duration'), MAX_DURATION),
+             _ratio((workout.get('calories_estimate') or 0) / max(workout.get('duration') or 1, 1), MAX_INTENSITY))
+            for workout in self.workouts
+        ]).reshape(len(self.workouts), 2)
+
+    def scores(self, type_affinity, trait_weights, target_difficulty):
+        """``(users, workouts)`` scores for row-aligned user preference arrays."""
+        gap = self.difficulty[None, :] - target_difficulty[:, None]
+        return (
+            type_affinity @ self.type_onehot.T
+            + trait_weights @ self.traits.T
+            - HARDER_PENALTY * np.maximum(gap, 0)
+            - EASIER_PENALTY * np.maximum(-gap, 0)
+        )
+
+    def top(self, scores, limit):
+        """Per row, ``[(workout, score)]`` for the ``limit`` best workouts."""
+        limit = min(limit, len(self.workouts))
+        if limit == 0:
+            return [[] for _ in range(len(scores))]
+        best = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+        results = []
+        for row, candidates in zip(scores, best):
+            ordered = candidates[np.lexsort((candidates, -row[candidates]))]
+            results.append([(self.workouts[index], float(row[index])) for index in ordered])
+        return results
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def workout_matrix():
+    global _matrix
+    current = caching.generation(Workout)
+    cached = _matrix
+    if cached is not None and cached[0] == current:
+        return cached[1]
+    with _matrix_lock:
+        matrix = WorkoutMatrix(get_collection(Workout).find({}))
+        _matrix = (current, matrix)
+    return matrix
+
+
+def activity_mix(user_ids, days=HISTORY_DAYS):
+    """Return ``{user_id: {activity_type: minutes}}`` over the last ``days``."""
+    since = timezone.now() - timedelta(days=days)
+    mix = {}
+    for row in get_collection(Activity).aggregate([
+        {'$match': {'user_id': {'$in': list(user_ids)}, 'date': {'$gte': since}}},
+        {'$group': {'_id': {'user': '$user_id', 'type': '$activity_type'}, 'minutes': {'$sum': '$duration'}}},
+    ]):
+        mix.setdefault(row['_id']['user'], {})[row['_id']['type']] = row['minutes']
+    return mix
+
+
+def target_difficulty(profile, weekly_minutes):
+    target = BASE_DIFFICULTY + (1 - BASE_DIFFICULTY) * _ratio(weekly_minutes, TRAINED_MINUTES)
+    age = profile.get('age')
+    if age and age > 50:
+        target -= 0.2 * _ratio(age - 50, 20)
+    weight, height = profile.get('weight'), profile.get('height')
+    if weight and height and weight / (height / 100) ** 2 >= 30:
+        target -= 0.2
+    return min(max(target, 0.0), 1.0)
+
+
+def preferences(profiles, mix, types, days=HISTORY_DAYS):
+    """Row-aligned ``(type_affinity, trait_weights, target_difficulty)`` arrays."""
+    affinity = np.zeros((len(profiles), len(types)))
+    traits = np.zeros((len(profiles), 2))
+    targets = np.zeros(len(profiles))
+    for row, profile in enumerate(profiles):
+        goal_types, duration_weight, intensity_weight = GOALS.get(
+            normalize(profile.get('fitness_goal')).strip(), DEFAULT_GOAL)
+        minutes = mix.get(str(profile['_id']), {})
+        history = np.array([minutes.get(activity_type, 0) for activity_type in types], dtype=float)
+        goal = np.array([goal_types.get(activity_type, 0.0) for activity_type in types])
+        if history.max(initial=0) > 0:
+            affinity[row] = HISTORY_WEIGHT * history / history.max() + (1 - HISTORY_WEIGHT) * goal
+        else:
+            affinity[row] = goal
+        traits[row] = duration_weight, intensity_weight
+        targets[row] = target_difficulty(profile, sum(minutes.values()) * 7 / days)
+    return affinity, traits, targets
+
+
+def recommend_many(profiles, limit=5, days=HISTORY_DAYS):
+    """Return ``{user_id: [(workout, score), ...]}`` for user profile documents."""
+    profiles = list(profiles)
+    if not profiles:
+        return {}
+    matrix = workout_matrix()
+    mix = activity_mix([str(profile['_id']) for profile in profiles], days)
+    scores = matrix.scores(*preferences(profiles, mix, matrix.types, days))
+    return {
+        str(profile['_id']): ranked
+        for profile, ranked in zip(profiles, matrix.top(scores, limit))
+    }
+
+
+def recommend(profile, limit=5, days=HISTORY_DAYS):
+    return recommend_many([profile], limit, days)[str(profile['_id'])]
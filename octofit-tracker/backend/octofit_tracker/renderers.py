@@ -0,0 +1,11 @@
+from rest_framework.renderers import JSONRenderer
+
+from .instrumentation import timer
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that reports its time as ``render`` in the request metrics."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timer('render'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,175 @@
+"""Daily and weekly activity rollups per user and per team.
+
+Every activity write adds its duration, calories and distance to four
+buckets (user/day, user/week, team/day, team/week) with upserting ``$inc``
+updates sent in a single ``bulk_write``. Trend queries then read one
+document per day or week instead of scanning raw activities. Team buckets
+use the team recorded on the activity when it is written (see
+``assign_teams``), so removing or editing it after the user has changed
+teams debits the team it was credited to. Writes bump the rollup cache
+generation so windowed leaderboards are recomputed.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from pymongo import UpdateOne
+
+from . import caching
+from .models import Activity, ActivityRollup, User
+from .mongo import get_collection, to_object_id
+from .synthetic import chunked
+
+PERIODS = ('day', 'week')
+METRICS = ('activities', 'duration', 'calories', 'distance')
+
+
+def bucket_start(value, period):
+    """Return the UTC start of the day or ISO week containing ``value``."""
+    if timezone.is_naive(value):
+        value = value.replace(tzinfo=dt_timezone.utc)
+    value = value.astimezone(dt_timezone.utc)
+    start = datetime(value.year, value.month, value.day, tzinfo=dt_timezone.utc)
+    if period == 'week':
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def _as_document(activity):
+    if isinstance(activity, dict):
+        return activity
+    return {
+        'user_id': activity.user_id,
+        'duration': activity.duration,
+        'calories': activity.calories,
+        'distance': activity.distance,
+        'date': activity.date,
+        'team': activity.team,
+    }
+
+
+def _teams_for(user_ids):
+    object_ids = [oid for oid in (to_object_id(user_id) for user_id in user_ids) if oid]
+    if not object_ids:
+        return {}
+    users = get_collection(User).find({'_id': {'$in': object_ids}}, {'team': 1})
+    return {str(user['_id']): user.get('team') for user in users}
+
+
+def team_of(user_id):
+    """The team to record on a new activity of ``user_id``; ``''`` for none."""
+    return _teams_for([user_id]).get(user_id) or ''
+
+
+def assign_teams(documents):
+    """Record their user's current team on activity documents that have none.
+
+    Returns the documents that were changed.
+    """
+    documents = [document for document in documents if document.get('team') is None]
+    teams = _teams_for({document['user_id'] for document in documents})
+    for document in documents:
+        document['team'] = teams.get(document['user_id']) or ''
+    return documents
+
+
+def increments(activities, sign=1):
+    """Sum activities into ``{(scope, key, period, start): {metric: value}}``."""
+    activities = [_as_document(activity) for activity in activities]
+    # Activities written before teams were recorded fall back to the current one.
+    teams = _teams_for({activity['user_id'] for activity in activities if activity.get('team') is None})
+    totals = {}
+    for activity in activities:
+        team = activity.get('team')
+        if team is None:
+            team = teams.get(activity['user_id'])
+        keys = [('user', activity['user_id'])]
+        if team:
+            keys.append(('team', team))
+        values = (sign, sign * activity['duration'], sign * activity['calories'],
+                  sign * (activity.get('distance') or 0))
+        for scope, key in keys:
+            for period in PERIODS:
+                bucket = totals.setdefault(
+                    (scope, key, period, bucket_start(activity['date'], period)),
+                    dict.fromkeys(METRICS, 0),
+                )
+                for metric, value in zip(METRICS, values):
+                    bucket[metric] += value
+    return totals
+
+
+def apply_increments(totals):
+    if not totals:
+        return
+    now = timezone.now()
+    operations = [
+        UpdateOne(
+            {'scope': scope, 'key': key, 'period': period, 'start': start},
+            {'$inc': values, '$set': {'updated_at': now}},
+            upsert=True,
+        )
+        for (scope, key, period, start), values in totals.items()
+    ]
+    get_collection(ActivityRollup).bulk_write(operations, ordered=False)
+    caching.invalidate(ActivityRollup)
+
+
+def merge(*parts):
+    merged = {}
+    for part in parts:
+        for bucket, values in part.items():
+            target = merged.setdefault(bucket, dict.fromkeys(METRICS, 0))
+            for metric, value in values.items():
+                target[metric] += value
+    return merged
+
+
+def record_activities(activities):
+    apply_increments(increments(activities))
+
+
+def record_activity(activity):
+    record_activities([activity])
+
+
+def remove_activity(activity):
+    apply_increments(increments([activity], sign=-1))
+
+
+def update_activity(previous, activity):
+    apply_increments(merge(increments([previous], sign=-1), increments([activity])))
+
+
+def backfill(chunk_size=10000, progress=None):
+    """Rebuild every rollup from the activities collection in streaming chunks.
+
+    Activities without a recorded team get their user's current one.
+    ``progress`` is called with the number of activities processed so far
+    after each chunk. Returns the total number of activities processed.
+    """
+    get_collection(ActivityRollup).delete_many({})
+    caching.invalidate(ActivityRollup)
+    projection = {'user_id': 1, 'duration': 1, 'calories': 1, 'distance': 1, 'date': 1, 'team': 1}
+    activities = get_collection(Activity)
+    processed = 0
+    for chunk in chunked(activities.find({}, projection, batch_size=chunk_size), chunk_size):
+        assigned = assign_teams(chunk)
+        if assigned:
+            activities.bulk_write([
+                UpdateOne({'_id': document['_id']}, {'$set': {'team': document['team']}})
+                for document in assigned
+            ], ordered=False)
+        record_activities(chunk)
+        processed += len(chunk)
+        if progress:
+            progress(processed)
+    return processed
+
+
+def series(scope, key, period, start, end):
+    """Return the buckets for ``key`` whose start lies in ``[start, end]``."""
+    return list(get_collection(ActivityRollup).find(
+        {'scope': scope, 'key': key, 'period': period,
+         'start': {'$gte': bucket_start(start, period), '$lte': end}},
+        {'_id': 0, 'start': 1, **dict.fromkeys(METRICS, 1)},
+    ).sort('start', 1))
@@ -0,0 +1,177 @@
+"""Full-text search over users and workouts.
+
+Searches run against MongoDB text indexes (see ``TEXT_INDEXES``; created by
+``ensure_indexes`` and migration 0006) and are ranked by ``textScore``. Text
+indexes match whole words only, so names are also matched by prefix with
+anchored, case-sensitive regexes (one per capitalization of the query),
+which the plain index on ``name`` answers without a scan.
+
+Where no text index exists (a fresh database before ``ensure_indexes``)
+``search`` falls back to an inverted index built in the process from the
+searchable fields; mongomock, which has no ``$text``, needs it forced with
+``SEARCH_BACKEND = 'memory'``. The index is rebuilt when the model's cache
+generation changes, i.e. after the model is written; see ``caching``.
+The ``SEARCH_BACKEND`` setting forces either implementation.
+"""
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from . import caching
+from .models import User, Workout
+from .mongo import get_collection
+
+# kind: (model, {field: weight})
+TEXT_INDEXES = {
+    'users': (User, {'name': 10, 'team': 3, 'email': 2}),
+    'workouts': (Workout, {'name': 10, 'activity_type': 3, 'description': 1}),
+}
+PREFIX_FIELD = 'name'
+# Score added for a prefix match on the name, on top of any word matches.
+PREFIX_SCORE = 10.0
+MAX_QUERY_LENGTH = 100
+# How long "auto" trusts its last look at the collection's indexes.
+INDEX_CHECK_SECONDS = 60
+TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def text_index_name(model):
+    return f'{model._meta.db_table}_text_idx'
+
+
+def ensure_text_indexes(dry_run=False):
+    """Create or rebuild the text indexes; returns ``[(action, collection, name)]``."""
+    actions = []
+    for model, weights in TEXT_INDEXES.values():
+        collection = get_collection(model)
+        name = text_index_name(model)
+        current = collection.index_information().get(name)
+        if current is not None and current.get('weights') == weights:
+            continue
+        actions.append(('rebuild' if current is not None else 'create', collection.name, name))
+        if dry_run:
+            continue
+        if current is not None:
+            collection.drop_index(name)
+        collection.create_index(
+            [(field, 'text') for field in weights], name=name, weights=weights,
+            # No stemming or stop words: names and the Portuguese/English mix
+            # in descriptions search better verbatim.
+            default_language='none', background=True,
+        )
+    return actions
+
+
+def normalize(text):
+    """Lowercase ``text`` and strip accents."""
+    decomposed = unicodedata.normalize('NFKD', str(text or '').lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return TOKEN.findall(normalize(text))
+
+
+class InvertedIndex:
+    """In-process stand-in for a text index over ``weights``' fields."""
+
+    def __init__(self, documents, weights):
+        self.documents = {}
+        self.postings = defaultdict(lambda: defaultdict(float))
+        self.prefixes = []
+        for document in documents:
+            key = document['_id']
+            self.documents[key] = document
+            for field, weight in weights.items():
+                for term in tokenize(document.get(field)):
+                    self.postings[term][key] += weight
+            self.prefixes.append((normalize(document.get(PREFIX_FIELD)), key))
+        self.prefixes.sort(key=lambda entry: entry[0])
+
+    def search(self, query, limit):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            for key, score in self.postings.get(term, {}).items():
+                scores[key] += score
+        prefix = normalize(query).strip()
+        if prefix:
+            position = bisect_left(self.prefixes, prefix, key=lambda entry: entry[0])
+            while position < len(self.prefixes) and self.prefixes[position][0].startswith(prefix):
+                scores[self.prefixes[position][1]] += PREFIX_SCORE
+                position += 1
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
+        return [dict(self.documents[key], score=score) for key, score in ranked]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def memory_index(kind):
+    model, weights = TEXT_INDEXES[kind]
+    current = caching.generation(model)
+    cached = _indexes.get(kind)
+    if cached is not None and cached[0] == current:
+        return cached[1]
+    with _indexes_lock:
+        index = InvertedIndex(get_collection(model).find({}), weights)
+        _indexes[kind] = (current, index)
+    return index
+
+
+def _prefix_patterns(query):
+    variants = {query, query.lower(), query.capitalize(), query.title()}
+    return [re.compile('^' + re.escape(variant)) for variant in sorted(variants)]
+
+
+_text_index_checks = {}
+
+
+def has_text_index(kind):
+    model, _ = TEXT_INDEXES[kind]
+    checked = _text_index_checks.get(kind)
+    if checked is None or time.monotonic() - checked[0] > INDEX_CHECK_SECONDS:
+        exists = text_index_name(model) in get_collection(model).index_information()
+        checked = _text_index_checks[kind] = (time.monotonic(), exists)
+    return checked[1]
+
+
+def text_search(kind, query, limit):
+    """Rank with the text index (which must exist)."""
+    model, _ = TEXT_INDEXES[kind]
+    collection = get_collection(model, read_only=True)
+    scored = {}
+    for document in collection.find(
+        {'$text': {'$search': query}}, {'score': {'$meta': 'textScore'}},
+    ).sort([('score', {'$meta': 'textScore'})]).limit(limit):
+        scored[document['_id']] = document
+    for document in collection.find({PREFIX_FIELD: {'$in': _prefix_patterns(query)}}).limit(limit):
+        match = scored.setdefault(document['_id'], dict(document, score=0.0))
+        match['score'] += PREFIX_SCORE
+    return sorted(scored.values(), key=lambda document: (-document['score'], str(document['_id'])))[:limit]
+
+
+def search(kind, query, limit=10):
+    """Return ``(backend, documents)``: the best ``limit`` matches, each with a ``score``."""
+    query = query.strip()[:MAX_QUERY_LENGTH]
+    backend = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if backend == 'text' or (backend == 'auto' and has_text_index(kind)):
+        return 'text', text_search(kind, query, limit)
+    return 'memory', memory_index(kind).search(query, limit)
+
+
+class TextSearchAdminMixin:
+    """Answer the admin search box from ``search`` instead of regex scans."""
+    search_kind = None
+    search_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        _, documents = search(self.search_kind, search_term, limit=self.search_limit)
+        return queryset.filter(_id__in=[document['_id'] for document in documents]), False
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from . import energy
 from .models import User, Team, Activity, Leaderboard, Workout
 
 
@@ -33,11 +34,23 @@ class ActivitySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Activity
-        fields = '__all__'
+        # The team is recorded by the server for the rollups.
+        exclude = ('team',)
+        # Omitted (or null) calories are estimated; see energy.
+        extra_kwargs = {'calories': {'required': False, 'allow_null': True}}
 
     def get__id(self, obj):
         return str(obj._id) if obj._id else None
 
+    def validate(self, attrs):
+        # Bulk paths pass estimate_calories=False and estimate whole chunks
+        # with energy.fill_missing instead of one user lookup per row.
+        if (attrs.get('calories') is None and (not self.partial or 'calories' in attrs)
+                and self.context.get('estimate_calories', True)):
+            values = {field: attrs.get(field, getattr(self.instance, field, None)) for field in energy.INPUTS}
+            attrs['calories'] = energy.estimate_activity(values)
+        return attrs
+
 
 class LeaderboardSerializer(serializers.ModelSerializer):
     _id = serializers.SerializerMethodField()
@@ -67,6 +67,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'octofit_tracker.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -77,7 +78,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'octofit_tracker.urls'
+# Server-Timing headers and the /api/_metrics endpoint
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', 'true').lower() in ('1', 'true', 'yes')
+
+# Async handlers for the hot GET endpoints; asgi.py turns this on. They need
+# motor, and motor 2.5 (the last release for djongo's pymongo 3.12) only
+# imports on Python 3.10 or older
+ASYNC_API = os.environ.get('OCTOFIT_ASYNC_API', 'false').lower() in ('1', 'true', 'yes')
+
+ROOT_URLCONF = 'octofit_tracker.async_urls' if ASYNC_API else 'octofit_tracker.urls'
 
 TEMPLATES = [
     {
@@ -106,13 +115,84 @@ DATABASES = {
         'ENGINE': 'djongo',
         'NAME': 'octofit_db',
         'ENFORCE_SCHEMA': False,
+        # Passed to MongoClient (and to motor's client under ASGI). Each
+        # process has one pool per server; size it for the worker's threads.
         'CLIENT': {
-            'host': 'localhost',
-            'port': 27017,
+            'host': os.environ.get('MONGO_HOST', 'localhost'),
+            'port': int(os.environ.get('MONGO_PORT', 27017)),
+            'maxPoolSize': int(os.environ.get('MONGO_MAX_POOL_SIZE', 50)),
+            'minPoolSize': int(os.environ.get('MONGO_MIN_POOL_SIZE', 4)),
+            'maxIdleTimeMS': int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000)),
+            # Fail a request that waits this long for a free connection
+            # instead of letting a burst queue up indefinitely.
+            'waitQueueTimeoutMS': int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000)),
+            'serverSelectionTimeoutMS': int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+            'connectTimeoutMS': int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+            'socketTimeoutMS': int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 30000)),
+            'appname': 'octofit-tracker',
         }
     }
 }
 
+# Wire compression, e.g. "zstd,zlib" (the server must allow it; zstd and
+# snappy need their Python packages). Off by default: local servers gain nothing.
+if os.environ.get('MONGO_COMPRESSORS'):
+    DATABASES['default']['CLIENT']['compressors'] = os.environ['MONGO_COMPRESSORS']
+
+# Read preference for the lag-tolerant read-only endpoints (leaderboard and
+# stats), e.g. secondaryPreferred to keep them off the primary of a replica set
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+
+# Open minPoolSize connections and ping the server when a worker starts
+MONGO_WARM_UP = os.environ.get('MONGO_WARM_UP', 'true').lower() in ('1', 'true', 'yes')
+
+# Serve the hot list/detail endpoints with pymongo instead of djongo's SQL layer
+NATIVE_MONGO_READS = os.environ.get('NATIVE_MONGO_READS', 'false').lower() in ('1', 'true', 'yes')
+
+# Render list responses with precompiled serializers instead of DRF's field machinery
+FAST_LIST_SERIALIZERS = os.environ.get('FAST_LIST_SERIALIZERS', 'true').lower() in ('1', 'true', 'yes')
+
+# Documents per insert_many call on the bulk ingestion paths
+BULK_INSERT_CHUNK_SIZE = int(os.environ.get('BULK_INSERT_CHUNK_SIZE', 1000))
+
+# Most activities accepted by one POST to /api/activities/bulk/
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 10000))
+
+# /api/search and admin search: "text" (MongoDB text indexes), "memory"
+# (in-process inverted index) or "auto" (text, falling back to memory
+# while the text indexes do not exist)
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+
+# Documents per cursor batch (and per streamed chunk) when exporting
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 2000))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Local memory is per process; use the file backend when several workers
+# must see each other's invalidations.
+
+if os.environ.get('CACHE_BACKEND') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'octofit',
+        }
+    }
+
+# Seconds a cached leaderboard/workout response may live without a write
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+
+# Turn the response cache off, e.g. to time the read paths themselves
+API_CACHE_ENABLED = os.environ.get('API_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -193,7 +273,12 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'octofit_tracker.renderers.TimedJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'octofit_tracker.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 50)),
 }
+
+# Upper bound for the ?page_size= query parameter
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
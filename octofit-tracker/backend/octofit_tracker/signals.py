@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching
+from .models import Activity, Leaderboard, Team, User, Workout
+
+
+@receiver([post_save, post_delete], sender=Activity)
+@receiver([post_save, post_delete], sender=Team)
+@receiver([post_save, post_delete], sender=Leaderboard)
+@receiver([post_save, post_delete], sender=Workout)
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_responses(sender, **kwargs):
+    caching.invalidate(sender)
@@ -0,0 +1,86 @@
+"""Team-level totals without joining users and activities by team name.
+
+Team totals are read from the weekly team rollups, which are maintained
+per team as activities are written (see ``rollups``), so a team costs one
+small ``$group`` over about 52 documents per year of history instead of a
+scan of its members' activities. Member counts come from a ``$group`` on
+``users.team``, served by its index. Top members are the team's current
+members (by ``users.team``) ranked on the all-time leaderboard, whose own
+``team`` is denormalized and may still name a user's previous team.
+"""
+from .models import ActivityRollup, Leaderboard, Team, User
+from .mongo import get_collection
+
+TOP_MEMBERS_PROJECTION = {
+    '_id': 0, 'user_id': 1, 'user_name': 1, 'total_calories': 1, 'total_activities': 1, 'rank': 1,
+}
+
+
+def team_totals(names=None):
+    """Return ``{team name: {total_calories, total_minutes, total_activities}}``."""
+    match = {'scope': 'team', 'period': 'week'}
+    if names is not None:
+        match['key'] = {'$in': list(names)}
+    rows = get_collection(ActivityRollup, read_only=True).aggregate([
+        {'$match': match},
+        {'$group': {
+            '_id': '$key',
+            'total_calories': {'$sum': '$calories'},
+            'total_minutes': {'$sum': '$duration'},
+            'total_activities': {'$sum': '$activities'},
+        }},
+    ])
+    return {row.pop('_id'): row for row in rows}
+
+
+def member_counts(names=None):
+    match = {'team': {'$in': list(names)} if names is not None else {'$nin': [None, '']}}
+    rows = get_collection(User, read_only=True).aggregate([
+        {'$match': match},
+        {'$group': {'_id': '$team', 'count': {'$sum': 1}}},
+    ])
+    return {row['_id']: row['count'] for row in rows}
+
+
+def _summary(team_id, name, totals, members):
+    return {
+        'team_id': str(team_id),
+        'team': name,
+        'member_count': members,
+        'total_calories': totals.get('total_calories', 0),
+        'total_minutes': totals.get('total_minutes', 0),
+        'total_activities': totals.get('total_activities', 0),
+    }
+
+
+def standings(team_id, name, top=5):
+    """Totals, member count and the ``top`` members (by calories) of a team."""
+    member_ids = [str(user['_id']) for user in get_collection(User, read_only=True).find({'team': name}, {'_id': 1})]
+    summary = _summary(team_id, name, team_totals([name]).get(name, {}), len(member_ids))
+    summary['top_members'] = list(
+        get_collection(Leaderboard, read_only=True).find({'user_id': {'$in': member_ids}}, TOP_MEMBERS_PROJECTION)
+        .sort('total_calories', -1)
+        .limit(top)
+    )
+    return summary
+
+
+def team_leaderboard():
+    """Every team ranked by total calories (competition ranking)."""
+    teams = list(get_collection(Team, read_only=True).find({}, {'name': 1}))
+    totals = team_totals()
+    members = member_counts()
+    rows = sorted(
+        (
+            _summary(team['_id'], team['name'], totals.get(team['name'], {}), members.get(team['name'], 0))
+            for team in teams
+        ),
+        key=lambda row: (-row['total_calories'], row['team']),
+    )
+    rank = 0
+    previous_total = None
+    for position, row in enumerate(rows, start=1):
+        if row['total_calories'] != previous_total:
+            rank, previous_total = position, row['total_calories']
+        row['rank'] = rank
+    return rows
@@ -0,0 +1,133 @@
+"""Deterministic synthetic data for load testing and benchmarks.
+
+Every generator takes a ``random.Random`` instance and yields plain
+documents ready for ``insert_many``, so arbitrarily large datasets can be
+streamed to MongoDB without holding them in memory. The same seed and
+anchor date always produce the same data, ``_id``s included; only the
+``created_at``/``updated_at`` stamps passed in by the caller differ between
+runs. The anchor defaults to today so activity dates stay recent.
+"""
+import math
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from bson import ObjectId
+
+from . import energy
+
+# activity_type: (share of activities, speed in km/h)
+ACTIVITY_PROFILES = {
+    'Running': (0.30, 10.0),
+    'Cycling': (0.22, 20.0),
+    'Swimming': (0.10, 2.5),
+    'Weightlifting': (0.15, None),
+    'Yoga': (0.13, None),
+    'Boxing': (0.10, None),
+}
+FITNESS_GOALS = ['Perder peso', 'Ganhar massa', 'Melhorar resistência', 'Manter a forma']
+GENDERS = [('M', 0.48, 176.0), ('F', 0.48, 163.0), ('O', 0.04, 170.0)]
+
+
+def anchor_date(day=None):
+    """Midnight UTC of ``day`` (default today); activity dates are generated backwards from it."""
+    day = day or datetime.now(dt_timezone.utc).date()
+    return datetime.combine(day, time(), tzinfo=dt_timezone.utc)
+
+
+def object_id(rng):
+    return ObjectId(rng.randbytes(12))
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def generate_teams(rng, count, created_at):
+    for index in range(1, count + 1):
+        yield {
+            '_id': object_id(rng),
+            'name': f'Team {index:04d}',
+            'description': f'Synthetic team #{index}',
+            'created_at': created_at,
+        }
+
+
+def generate_users(rng, count, team_names, created_at):
+    gender_codes = [code for code, _, _ in GENDERS]
+    gender_weights = [share for _, share, _ in GENDERS]
+    mean_heights = {code: height for code, _, height in GENDERS}
+    for index in range(1, count + 1):
+        gender = rng.choices(gender_codes, gender_weights)[0]
+        height = round(rng.gauss(mean_heights[gender], 7.0), 1)
+        bmi = _clamp(rng.gauss(24.5, 3.5), 17.0, 40.0)
+        yield {
+            '_id': object_id(rng),
+            'name': f'Athlete {index:07d}',
+            'email': f'athlete{index:07d}@octofit.test',
+            'team': rng.choice(team_names) if team_names else None,
+            'weight': round(bmi * (height / 100) ** 2, 1),
+            'height': height,
+            'age': int(_clamp(rng.gauss(34, 10), 16, 75)),
+            'gender': gender,
+            'fitness_goal': rng.choice(FITNESS_GOALS),
+            'bio': None,
+            'created_at': created_at,
+            'updated_at': created_at,
+        }
+
+
+def generate_activities(rng, user_id, mean_count, anchor, created_at, weight=None):
+    """Yield a skewed number of activities for one user (mean ``mean_count``).
+
+    Calories are the MET estimates for ``weight``; see ``energy``.
+    """
+    types = list(ACTIVITY_PROFILES)
+    shares = [ACTIVITY_PROFILES[name][0] for name in types]
+    count = round(rng.gammavariate(2.0, mean_count / 2.0)) if mean_count > 0 else 0
+    activities = []
+    for _ in range(count):
+        activity_type = rng.choices(types, shares)[0]
+        _, speed = ACTIVITY_PROFILES[activity_type]
+        duration = int(_clamp(rng.lognormvariate(math.log(45), 0.4), 10, 180))
+        distance = None
+        if speed is not None:
+            distance = round(speed * duration / 60 * rng.uniform(0.8, 1.2), 2)
+        days_ago = min(365.0, rng.expovariate(1 / 60))
+        activities.append({
+            '_id': object_id(rng),
+            'user_id': user_id,
+            'activity_type': activity_type,
+            'duration': duration,
+            'distance': distance,
+            'date': anchor - timedelta(days=days_ago),
+            'created_at': created_at,
+        })
+    if not activities:
+        return
+    calories = energy.estimate_many(
+        [activity['activity_type'] for activity in activities],
+        [activity['duration'] for activity in activities],
+        [activity['distance'] for activity in activities],
+        [weight] * len(activities),
+    )
+    for activity, kcal in zip(activities, calories):
+        activity['calories'] = int(kcal)
+        yield activity
+
+
+def write_stream(collection, documents, batch_size):
+    """Insert ``documents`` in chunks of ``batch_size``; return how many were written."""
+    written = 0
+    for chunk in chunked(documents, batch_size):
+        collection.insert_many(chunk, ordered=False)
+        written += len(chunk)
+    return written
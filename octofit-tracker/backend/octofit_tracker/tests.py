@@ -1,8 +1,24 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import User, Team, Activity, Leaderboard, Workout
-from datetime import datetime
+from pymongo import ReadPreference, monitoring
+from .models import User, Team, Activity, Leaderboard, Workout, ActivityRollup
+from . import benchmarks, export, importer, instrumentation, mongo, search, synthetic
+from .querybudget import BudgetListener, QueryBudget, QueryBudgetExceeded, declared_budget, fingerprint
+from .indexes import app_models, reconcile, find_collection_scans
+from datetime import date, datetime, timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import skipUnless
+import gzip
+import json
+import os
+import random
+import tempfile
 
 
 class UserModelTest(TestCase):
@@ -124,3 +140,1008 @@ class WorkoutAPITest(APITestCase):
     def test_list_workouts(self):
         response = self.client.get('/api/workouts/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class LeaderboardEngineTest(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create(name='Alice', email='alice@example.com', team='Team A')
+        self.bob = User.objects.create(name='Bob', email='bob@example.com', team='Team B')
+
+    def post_activity(self, user, calories):
+        return self.client.post('/api/activities/', {
+            'user_id': str(user._id),
+            'activity_type': 'Running',
+            'duration': 30,
+            'calories': calories,
+            'date': '2024-01-01T10:00:00Z',
+        })
+
+    def entry(self, user):
+        return Leaderboard.objects.get(user_id=str(user._id))
+
+    def test_create_updates_totals_and_ranks(self):
+        self.post_activity(self.alice, 300)
+        self.post_activity(self.alice, 200)
+        self.assertEqual(self.entry(self.alice).total_calories, 500)
+        self.assertEqual(self.entry(self.alice).total_activities, 2)
+        self.assertEqual(self.entry(self.alice).user_name, 'Alice')
+        self.assertEqual(self.entry(self.alice).rank, 1)
+
+        self.post_activity(self.bob, 800)
+        self.assertEqual(self.entry(self.bob).rank, 1)
+        self.assertEqual(self.entry(self.alice).rank, 2)
+
+    def test_delete_moves_entry_down(self):
+        self.post_activity(self.alice, 300)
+        response = self.post_activity(self.bob, 500)
+        self.client.delete(f"/api/activities/{response.data['_id']}/")
+        self.assertEqual(self.entry(self.bob).total_calories, 0)
+        self.assertEqual(self.entry(self.bob).rank, 2)
+        self.assertEqual(self.entry(self.alice).rank, 1)
+
+    def test_writes_recompute_ranks_in_their_band(self):
+        carol = User.objects.create(name='Carol', email='carol@example.com')
+        self.post_activity(self.alice, 300)
+        self.post_activity(self.bob, 500)
+        self.post_activity(carol, 500)
+        # Stale ranks, as a concurrent write could leave them.
+        mongo.get_collection(Leaderboard).update_many({}, {'$set': {'rank': 9}})
+        self.post_activity(self.alice, 300)
+        self.assertEqual([self.entry(user).rank for user in (self.alice, self.bob, carol)], [1, 2, 2])
+
+
+class StatsAPITest(APITestCase):
+    def test_stats(self):
+        user = User.objects.create(name='Stats User', email='stats@example.com', team='Stats Team')
+        Team.objects.create(name='Stats Team')
+        for calories in (100, 200, 300):
+            Activity.objects.create(
+                user_id=str(user._id),
+                activity_type='Running',
+                duration=30,
+                calories=calories,
+                date=datetime(2024, 1, 1, 10, 0),
+            )
+        response = self.client.get('/api/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_users'], 1)
+        self.assertEqual(response.data['total_teams'], 1)
+        self.assertEqual(response.data['total_activities'], 3)
+        self.assertEqual(response.data['total_calories'], 600)
+        self.assertEqual(len(response.data['recent_activities']), 3)
+
+    def test_stats_are_cached_until_activities_change(self):
+        user = User.objects.create(name='Cached Stats', email='cached-stats@example.com')
+        self.client.get('/api/stats/')
+        # Not a write the cache knows about, so the cached summary is served.
+        mongo.get_collection(Team).insert_one({'name': 'Unseen Team'})
+        with QueryBudget(0, label='cached stats'):
+            self.assertEqual(self.client.get('/api/stats/').data['total_teams'], 0)
+
+        self.client.post('/api/activities/bulk/', [
+            {'user_id': str(user._id), 'activity_type': 'Yoga', 'duration': 30, 'calories': 90,
+             'date': '2024-01-02T08:00:00Z'},
+        ], format='json')
+        response = self.client.get('/api/stats/')
+        self.assertEqual((response.data['total_activities'], response.data['total_calories']), (1, 90))
+        self.assertEqual(response.data['total_teams'], 1)
+
+
+class PaginationAPITest(APITestCase):
+    def test_activities_are_paginated_by_cursor(self):
+        for day in range(1, 6):
+            Activity.objects.create(
+                user_id='123',
+                activity_type='Running',
+                duration=30,
+                calories=100 * day,
+                date=datetime(2024, 1, day, 10, 0),
+            )
+        response = self.client.get('/api/activities/', {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([a['calories'] for a in response.data['results']], [500, 400])
+        self.assertIsNotNone(response.data['next'])
+
+        seen = [a['_id'] for a in response.data['results']]
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url)
+            seen.extend(a['_id'] for a in response.data['results'])
+            next_url = response.data['next']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_id_ordered_lists_page_through_the_orm(self):
+        for index in range(5):
+            Team.objects.create(name=f'Team {index}')
+        names = []
+        response = self.client.get('/api/teams/', {'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names.extend(team['name'] for team in response.data['results'])
+            if not response.data['next']:
+                break
+            last_page = response
+            response = self.client.get(response.data['next'])
+        self.assertEqual(names, [f'Team {index}' for index in range(4, -1, -1)])
+
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual(previous.data['results'], last_page.data['results'])
+
+
+class NativeReadPathTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(name='Native User', email='native@example.com', team='Native Team')
+        for day in range(1, 4):
+            Activity.objects.create(
+                user_id=str(self.user._id),
+                activity_type='Cycling',
+                duration=45,
+                calories=350,
+                distance=12.5,
+                date=datetime(2024, 2, day, 7, 30),
+            )
+
+    def assertSameOutput(self, url):
+        with self.settings(NATIVE_MONGO_READS=False):
+            orm = self.client.get(url)
+        with self.settings(NATIVE_MONGO_READS=True):
+            native = self.client.get(url)
+        self.assertEqual(orm.status_code, status.HTTP_200_OK)
+        self.assertEqual(native.content, orm.content)
+
+    def test_list_matches_orm(self):
+        self.assertSameOutput('/api/activities/')
+        self.assertSameOutput('/api/users/')
+
+    def test_detail_matches_orm(self):
+        self.assertSameOutput(f'/api/users/{self.user._id}/')
+        activity = Activity.objects.first()
+        self.assertSameOutput(f'/api/activities/{activity._id}/')
+
+    def test_benchmark_compares_uncached_reads(self):
+        self.client.get('/api/leaderboard/', {'page_size': 2})
+        output = StringIO()
+        call_command('benchmark_reads', iterations=2, page_size=2, stdout=output)
+        self.assertIn('leaderboard  list', output.getvalue())
+        self.assertNotIn('MISMATCH', output.getvalue())
+
+
+class IndexTest(TestCase):
+    def test_declared_indexes_are_created_and_used(self):
+        for model in app_models():
+            reconcile(model)
+        for model in app_models():
+            self.assertEqual(reconcile(model), [])
+        self.assertEqual(find_collection_scans(), [])
+
+
+class BulkActivityAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(name='Bulk User', email='bulk@example.com', team='Bulk Team')
+
+    def activity(self, calories):
+        return {
+            'user_id': str(self.user._id),
+            'activity_type': 'Running',
+            'duration': 30,
+            'calories': calories,
+            'date': '2024-03-01T08:00:00Z',
+        }
+
+    def test_bulk_json_reports_per_item_results(self):
+        items = [self.activity(100), {'activity_type': 'Running'}, self.activity(200)]
+        response = self.client.post('/api/activities/bulk/?chunk_size=1', items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'error', 'created'])
+        self.assertEqual(Activity.objects.count(), 2)
+
+        entry = Leaderboard.objects.get(user_id=str(self.user._id))
+        self.assertEqual(entry.total_calories, 300)
+        self.assertEqual(entry.total_activities, 2)
+
+    def test_bulk_ndjson(self):
+        body = '\n'.join(json.dumps(self.activity(calories)) for calories in (50, 60, 70))
+        response = self.client.post('/api/activities/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+
+    @override_settings(BULK_MAX_ITEMS=2)
+    def test_bulk_rejects_too_many_items(self):
+        items = [self.activity(calories) for calories in (50, 60, 70)]
+        response = self.client.post('/api/activities/bulk/', items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('at most 2', response.data['non_field_errors'][0])
+        self.assertEqual(Activity.objects.count(), 0)
+
+
+class PopulateDbCommandTest(TestCase):
+    def test_synthetic_dataset(self):
+        # Batched writes: the command count grows with batches, not with users.
+        with QueryBudget(100, label='populate_db'):
+            call_command('populate_db', users=30, activities_per_user=5, teams=3, batch_size=10, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Team.objects.count(), 3)
+        self.assertEqual(Leaderboard.objects.filter(rank=1).count(), 1)
+        self.assertGreater(Workout.objects.count(), 0)
+
+    def test_generators_are_reproducible(self):
+        def generate():
+            rng = random.Random(7)
+            teams = list(synthetic.generate_teams(rng, 2, None))
+            users = list(synthetic.generate_users(rng, 3, [team['name'] for team in teams], None))
+            anchor = synthetic.anchor_date(date(2024, 1, 31))
+            activities = list(synthetic.generate_activities(rng, str(users[0]['_id']), 4, anchor, None))
+            return teams, users, activities
+
+        self.assertEqual(generate(), generate())
+
+
+class ResponseCacheTest(APITestCase):
+    def test_workout_list_etag_and_invalidation(self):
+        Workout.objects.create(
+            name='Cached Run', description='Cache me', activity_type='Running',
+            difficulty='Beginner', duration=20, calories_estimate=200,
+        )
+        first = self.client.get('/api/workouts/', HTTP_ACCEPT='application/json')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        etag = first['ETag']
+
+        second = self.client.get('/api/workouts/', HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Workout.objects.create(
+            name='Cached Ride', description='New row', activity_type='Cycling',
+            difficulty='Beginner', duration=30, calories_estimate=250,
+        )
+        third = self.client.get('/api/workouts/', HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(third.status_code, status.HTTP_200_OK)
+        self.assertEqual(third['X-Cache'], 'MISS')
+
+
+class FastSerializerTest(APITestCase):
+    def test_fast_list_matches_drf(self):
+        user = User.objects.create(name='Fast User', email='fast@example.com', team='Fast Team', weight=70.5, gender='F')
+        Activity.objects.create(
+            user_id=str(user._id), activity_type='Yoga', duration=60, calories=180, date=datetime(2024, 4, 1, 6, 0),
+        )
+        for url in ('/api/users/', '/api/activities/'):
+            with self.settings(FAST_LIST_SERIALIZERS=False):
+                expected = self.client.get(url, HTTP_ACCEPT='application/json').content
+            with self.settings(FAST_LIST_SERIALIZERS=True):
+                actual = self.client.get(url, HTTP_ACCEPT='application/json').content
+            self.assertEqual(actual, expected)
+
+
+def motor_available():
+    try:
+        import motor.motor_asyncio  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@skipUnless(motor_available(), 'motor is not installed or does not import on this Python (3.10 or older needed)')
+@override_settings(ROOT_URLCONF='octofit_tracker.async_urls')
+class AsyncAPITest(APITestCase):
+    def test_async_list_matches_sync(self):
+        Activity.objects.create(
+            user_id='123', activity_type='Running', duration=30, calories=300, date=datetime(2024, 5, 1, 9, 0),
+        )
+        expected = self.client.get('/api/activities/', HTTP_ACCEPT='application/json').content
+        response = async_to_sync(AsyncClient().get)('/api/activities/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected)
+
+    def test_async_stats(self):
+        response = async_to_sync(AsyncClient().get)('/api/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('total_activities', response.json())
+
+    def test_cached_resources_use_the_sync_cache(self):
+        client = AsyncClient()
+        first = async_to_sync(client.get)('/api/leaderboard/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        second = async_to_sync(client.get)('/api/leaderboard/')
+        self.assertEqual((second['X-Cache'], second['ETag']), ('HIT', first['ETag']))
+
+
+class RollupTest(APITestCase):
+    def test_activity_writes_update_rollups(self):
+        user = User.objects.create(name='Rollup User', email='rollup@example.com', team='Rollup Team')
+        for calories in (100, 150):
+            self.client.post('/api/activities/', {
+                'user_id': str(user._id),
+                'activity_type': 'Running',
+                'duration': 30,
+                'calories': calories,
+                'distance': 5.0,
+                'date': timezone.now().isoformat(),
+            })
+        day = ActivityRollup.objects.get(scope='user', key=str(user._id), period='day')
+        self.assertEqual(day.activities, 2)
+        self.assertEqual(day.calories, 250)
+        self.assertEqual(ActivityRollup.objects.get(scope='team', key='Rollup Team', period='week').duration, 60)
+
+        response = self.client.get(f'/api/users/{user._id}/trends/', {'period': 'day', 'days': 7})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['buckets'][-1]['calories'], 250)
+
+    def test_reversals_debit_the_team_that_was_credited(self):
+        user = User.objects.create(name='Mover', email='mover@example.com', team='Old Team')
+        response = self.client.post('/api/activities/', {
+            'user_id': str(user._id),
+            'activity_type': 'Yoga',
+            'duration': 40,
+            'calories': 120,
+            'date': timezone.now().isoformat(),
+        })
+        mongo.get_collection(User).update_one({'_id': user._id}, {'$set': {'team': 'New Team'}})
+
+        url = f'/api/activities/{response.data["_id"]}/'
+        self.client.patch(url, {'calories': 200}, format='json')
+        self.assertEqual(ActivityRollup.objects.get(scope='team', key='Old Team', period='day').calories, 200)
+        self.client.delete(url)
+        old = ActivityRollup.objects.get(scope='team', key='Old Team', period='day')
+        self.assertEqual((old.activities, old.calories), (0, 0))
+        self.assertFalse(ActivityRollup.objects.filter(scope='team', key='New Team').exists())
+
+
+class WindowedLeaderboardTest(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create(name='Alice', email='alice@example.com', team='Team A')
+        self.bob = User.objects.create(name='Bob', email='bob@example.com', team='Team B')
+
+    def post_activity(self, user, calories, days_ago=0):
+        return self.client.post('/api/activities/', {
+            'user_id': str(user._id),
+            'activity_type': 'Running',
+            'duration': 30,
+            'calories': calories,
+            'date': (timezone.now() - timedelta(days=days_ago)).isoformat(),
+        })
+
+    def test_window_excludes_older_activities(self):
+        self.post_activity(self.alice, 300)
+        self.post_activity(self.bob, 900, days_ago=20)
+        response = self.client.get('/api/leaderboard/', {'window': '7d', 'user_id': str(self.bob._id)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['user_name'] for row in response.data['results']], ['Alice'])
+        self.assertIsNone(response.data['me'])
+
+        response = self.client.get('/api/leaderboard/', {'window': 'month', 'user_id': str(self.alice._id)})
+        self.assertEqual([row['rank'] for row in response.data['results']], [1, 2])
+        self.assertEqual(response.data['me']['rank'], 2)
+
+    def test_team_filter_and_cache_invalidation(self):
+        self.post_activity(self.alice, 300)
+        self.post_activity(self.bob, 900)
+        response = self.client.get('/api/leaderboard/', {'window': '7d', 'team': 'Team A'})
+        self.assertEqual(response.data['participants'], 1)
+        self.assertEqual(response.data['results'][0]['total_calories'], 300)
+
+        self.post_activity(self.alice, 100)
+        response = self.client.get('/api/leaderboard/', {'window': '7d', 'team': 'Team A'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['total_calories'], 400)
+
+    def test_invalid_window(self):
+        response = self.client.get('/api/leaderboard/', {'window': '7y'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TeamStandingsTest(APITestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name='Team A')
+        Team.objects.create(name='Team B')
+        self.alice = User.objects.create(name='Alice', email='alice@example.com', team='Team A')
+        self.carol = User.objects.create(name='Carol', email='carol@example.com', team='Team A')
+        self.bob = User.objects.create(name='Bob', email='bob@example.com', team='Team B')
+
+    def post_activity(self, user, calories, duration=30):
+        return self.client.post('/api/activities/', {
+            'user_id': str(user._id),
+            'activity_type': 'Running',
+            'duration': duration,
+            'calories': calories,
+            'date': '2024-01-01T10:00:00Z',
+        })
+
+    def test_standings(self):
+        self.post_activity(self.alice, 300, duration=40)
+        self.post_activity(self.carol, 500, duration=20)
+        self.post_activity(self.bob, 900)
+        response = self.client.get(f'/api/teams/{self.team._id}/standings/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['member_count'], 2)
+        self.assertEqual(response.data['total_calories'], 800)
+        self.assertEqual(response.data['total_minutes'], 60)
+        self.assertEqual([member['user_name'] for member in response.data['top_members']], ['Carol', 'Alice'])
+
+    def test_top_members_follow_team_changes(self):
+        self.post_activity(self.alice, 300)
+        self.post_activity(self.carol, 500)
+        self.carol.team = 'Team B'
+        self.carol.save()
+        response = self.client.get(f'/api/teams/{self.team._id}/standings/')
+        self.assertEqual(response.data['member_count'], 1)
+        self.assertEqual([member['user_name'] for member in response.data['top_members']], ['Alice'])
+        response = self.client.get(f'/api/teams/{Team.objects.get(name="Team B")._id}/standings/')
+        self.assertEqual([member['user_name'] for member in response.data['top_members']], ['Carol'])
+
+    def test_team_leaderboard(self):
+        self.post_activity(self.alice, 300)
+        self.post_activity(self.bob, 900)
+        response = self.client.get('/api/teams/leaderboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row['team'], row['rank']) for row in response.data], [('Team B', 1), ('Team A', 2)])
+        self.assertEqual(response.data[1]['member_count'], 2)
+
+
+class ExpandUserTest(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create(name='Alice', email='alice@example.com', team='Team A')
+        for calories in (100, 200):
+            self.client.post('/api/activities/', {
+                'user_id': str(self.alice._id),
+                'activity_type': 'Running',
+                'duration': 30,
+                'calories': calories,
+                'date': '2024-01-01T10:00:00Z',
+            })
+
+    def test_expand_user_on_activities(self):
+        response = self.client.get('/api/activities/', {'expand': 'user'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for row in response.data['results']:
+            self.assertEqual(row['user'], {'_id': str(self.alice._id), 'name': 'Alice', 'team': 'Team A'})
+
+    def test_expand_user_on_leaderboard(self):
+        response = self.client.get('/api/leaderboard/', {'expand': 'user'})
+        self.assertEqual(response.data['results'][0]['user']['name'], 'Alice')
+
+    def test_expanded_leaderboard_follows_user_changes(self):
+        self.client.get('/api/leaderboard/', {'expand': 'user'})
+        self.alice.name = 'Alice Renamed'
+        self.alice.save()
+        response = self.client.get('/api/leaderboard/', {'expand': 'user'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['user']['name'], 'Alice Renamed')
+
+    def test_without_expand(self):
+        response = self.client.get('/api/activities/')
+        self.assertNotIn('user', response.data['results'][0])
+
+    def test_unknown_expansion(self):
+        response = self.client.get('/api/activities/', {'expand': 'team'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_user_id_is_not_found(self):
+        response = self.client.get('/api/users/' + 'f' * 24 + '/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ActivityExportTest(APITestCase):
+    def setUp(self):
+        for calories in (100, 200, 300):
+            self.client.post('/api/activities/', {
+                'user_id': 'user-1',
+                'activity_type': 'Running',
+                'duration': 30,
+                'calories': calories,
+                'date': '2024-01-01T10:00:00Z',
+            })
+
+    def test_ndjson_export(self):
+        response = self.client.get('/api/activities/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(sorted(row['calories'] for row in rows), [100, 200, 300])
+
+    def test_gzipped_csv_export_since(self):
+        response = self.client.get('/api/activities/export/', {'format': 'csv', 'gzip': '1', 'since': '2999-01-01'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        body = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertEqual(body.splitlines(), [','.join(export.FIELDS)])
+
+    def test_export_command(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'activities.csv')
+            call_command('export_activities', '--format', 'csv', '--output', path, stdout=out)
+            with open(path) as output:
+                self.assertEqual(len(output.read().splitlines()), 4)
+
+    def test_invalid_format(self):
+        response = self.client.get('/api/activities/export/', {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportDataCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as output:
+            output.write(content)
+        return path
+
+    def test_import_users_upserts_by_email(self):
+        User.objects.create(name='Old Name', email='alice@example.com')
+        path = self.write('users.ndjson', '\n'.join(json.dumps(row) for row in [
+            {'name': 'Alice', 'email': 'alice@example.com', 'team': 'Team A'},
+            {'name': 'Bob', 'email': 'bob@example.com'},
+            {'name': 'Broken', 'email': 'not-an-email'},
+        ]))
+        call_command('import_data', 'users', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(User.objects.get(email='alice@example.com').name, 'Alice')
+
+    def test_blank_cells_keep_existing_user_fields(self):
+        User.objects.create(name='Alice', email='alice@example.com', team='Team A', weight=61.5, height=168)
+        path = self.write('users.csv', 'name,email,team,weight,height\n'
+                          'Alice Smith,alice@example.com,,,170\n'
+                          'Bob,bob@example.com,,,\n')
+        call_command('import_data', 'users', path, stdout=StringIO(), stderr=StringIO())
+        alice = User.objects.get(email='alice@example.com')
+        self.assertEqual((alice.name, alice.team, alice.weight, alice.height), ('Alice Smith', 'Team A', 61.5, 170))
+        self.assertIsNone(User.objects.get(email='bob@example.com').weight)
+
+    def test_import_activities_is_idempotent(self):
+        path = self.write('activities.csv', 'user_id,activity_type,duration,calories,distance,date\n'
+                          'user-1,Running,30,300,5.0,2024-01-01T10:00:00Z\n'
+                          'user-1,Yoga,45,150,,2024-01-02T10:00:00Z\n')
+        for _ in range(2):
+            call_command('import_data', 'activities', path, '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(Activity.objects.count(), 2)
+        self.assertEqual(Leaderboard.objects.get(user_id='user-1').total_calories, 450)
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_fingerprint_covers_the_whole_file(self):
+        head = 'user_id,activity_type,duration,calories,distance,date\n' + 'x' * (1 << 17)
+        first = self.write('first.csv', head + 'user-1,Running,30,300,5.0,2024-01-01T10:00:00Z\n')
+        second = self.write('second.csv', head + 'user-2,Running,30,300,5.0,2024-01-01T10:00:00Z\n')
+        self.assertNotEqual(importer.fingerprint(first), importer.fingerprint(second))
+        self.assertEqual(importer.fingerprint(first), importer.fingerprint(self.write('copy.csv', head + (
+            'user-1,Running,30,300,5.0,2024-01-01T10:00:00Z\n'))))
+
+
+class RequestMetricsTest(APITestCase):
+    def test_server_timing_header(self):
+        response = self.client.get('/api/activities/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", .*total;dur=[\d.]+$')
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/workouts/')
+        response = self.client.get('/api/_metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('# TYPE octofit_request_duration_seconds histogram', body)
+        self.assertIn('octofit_requests_total{view="WorkoutViewSet.list",method="GET",status="200"}', body)
+        self.assertIn('octofit_db_queries_count{view="WorkoutViewSet.list",method="GET"}', body)
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_metrics_can_be_disabled(self):
+        response = self.client.get('/api/activities/')
+        self.assertNotIn('Server-Timing', response)
+
+
+class BenchmarkHelpersTest(TestCase):
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmarks.percentile(values, 50), 50.5)
+        self.assertAlmostEqual(benchmarks.percentile(values, 99), 99.01)
+        self.assertEqual(benchmarks.percentile([], 95), 0.0)
+
+    def test_compare_flags_latency_and_query_regressions(self):
+        baseline = {'small': {
+            'users-list': benchmarks.summarize([10.0] * 10, [2] * 10, 0),
+            'dashboard': benchmarks.summarize([0.2] * 10, [4] * 10, 0),
+        }}
+        current = {'small': {
+            'users-list': benchmarks.summarize([20.0] * 10, [3] * 10, 0),
+            'dashboard': benchmarks.summarize([0.4] * 10, [4] * 10, 0),
+        }}
+        regressions = benchmarks.compare(baseline, current, threshold=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(line.startswith('small/users-list') for line in regressions))
+
+
+class QueryBudgetTest(APITestCase):
+    def command(self, name, command):
+        # The events pymongo hands to listeners; ``name`` is the first key.
+        self.assertEqual(next(iter(command)), name)
+        return monitoring.CommandStartedEvent(command, 'octofit_db', 1, ('localhost', 27017), 1)
+
+    def test_fingerprints_hide_values(self):
+        self.assertEqual(
+            fingerprint('find', {'find': 'activities', 'filter': {'user_id': 'u1', 'date': {'$gte': 1}}}),
+            'find activities {"date": {"$gte": "?"}, "user_id": "?"}',
+        )
+        self.assertEqual(
+            fingerprint('aggregate', {'aggregate': 'users', 'pipeline': [{'$match': {'_id': {'$in': [1, 2]}}},
+                                                                         {'$group': {'_id': None}}]}),
+            'aggregate users [{"$match": {"_id": {"$in": "[?]"}}}, "$group"]',
+        )
+        self.assertEqual(
+            fingerprint('update', {'update': 'leaderboard', 'updates': [{'q': {'rank': 3}, 'u': {}}]}),
+            'update leaderboard {"rank": "?"}',
+        )
+        self.assertEqual(fingerprint('insert', {'insert': 'activities', 'documents': []}), 'insert activities')
+
+    def test_exceeding_the_budget_reports_fingerprints(self):
+        listener = BudgetListener()
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with QueryBudget(2, label='team page'):
+                listener.started(self.command('find', {'find': 'teams', 'filter': {}}))
+                for user_id in ('a', 'b'):
+                    listener.started(self.command('find', {'find': 'users', 'filter': {'_id': user_id}}))
+                listener.started(self.command('endSessions', {'endSessions': []}))
+        report = str(raised.exception)
+        self.assertIn('3 MongoDB commands for team page, budget 2', report)
+        self.assertIn('   2 x find users {"_id": "?"}', report)
+
+    def test_decorator_and_nested_budgets(self):
+        listener = BudgetListener()
+
+        @QueryBudget(1)
+        def lookup():
+            listener.started(self.command('find', {'find': 'users', 'filter': {}}))
+
+        with QueryBudget(5) as outer:
+            lookup()
+            lookup()
+        self.assertEqual(outer.count, 2)
+
+    def test_declared_budgets(self):
+        self.assertEqual(declared_budget('/api/activities/', 'POST'), 9)
+        self.assertEqual(declared_budget('/api/leaderboard/?window=7d'), 3)
+        self.assertIsNone(declared_budget('/api/stats/'))
+        self.assertIsNone(declared_budget('/nowhere/'))
+
+    def test_endpoints_stay_within_their_budget(self):
+        with QueryBudget(0, strict=False) as probe:
+            User.objects.first()
+        if not probe.count:
+            self.skipTest('no command monitoring events (mongomock); budgets only bite against mongod')
+        call_command('populate_db', users=20, activities_per_user=3, teams=2, stdout=StringIO())
+        user, team = User.objects.first(), Team.objects.first()
+        for path in ['/api/users/', f'/api/users/{user._id}/', f'/api/users/{user._id}/trends/',
+                     '/api/activities/?expand=user', '/api/leaderboard/?window=30d&expand=user',
+                     f'/api/teams/{team._id}/standings/', '/api/teams/leaderboard/', '/api/workouts/']:
+            with self.settings(API_CACHE_ENABLED=False), QueryBudget(declared_budget(path), label=path) as budget:
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, path)
+            self.assertGreater(budget.count, 0, path)
+
+
+class MongoClientTest(TestCase):
+    def test_warm_up_pings_the_server(self):
+        self.assertTrue(mongo.warm_up())
+
+    @override_settings(MONGO_READ_PREFERENCE='secondaryPreferred')
+    def test_read_only_collections_follow_the_read_preference(self):
+        self.assertEqual(mongo.get_collection(Leaderboard, read_only=True).read_preference,
+                         ReadPreference.SECONDARY_PREFERRED)
+        self.assertEqual(mongo.get_collection(Leaderboard).read_preference, ReadPreference.PRIMARY)
+
+    @override_settings(MONGO_READ_PREFERENCE='closest')
+    def test_invalid_read_preference(self):
+        with self.assertRaises(ImproperlyConfigured):
+            mongo.get_collection(Leaderboard, read_only=True)
+
+    def test_pool_metrics(self):
+        listener = instrumentation.PoolMetrics()
+        server = SimpleNamespace(address=('mongo.test', 27017))
+        listener.pool_created(SimpleNamespace(address=server.address, options={'maxPoolSize': 5}))
+        for _ in range(2):
+            listener.connection_created(server)
+            listener.connection_check_out_started(server)
+            listener.connection_checked_out(server)
+        listener.connection_checked_in(server)
+        listener.connection_check_out_started(server)
+        listener.connection_check_out_failed(SimpleNamespace(address=server.address, reason='timeout'))
+
+        body = instrumentation.expose()
+        self.assertIn('# TYPE octofit_mongo_pool_connections gauge', body)
+        self.assertIn('octofit_mongo_pool_connections{server="mongo.test:27017"} 2', body)
+        self.assertIn('octofit_mongo_pool_checked_out{server="mongo.test:27017"} 1', body)
+        self.assertIn('octofit_mongo_pool_max_size{server="mongo.test:27017"} 5', body)
+        self.assertIn('octofit_mongo_pool_wait_seconds_count{server="mongo.test:27017"} 3', body)
+        self.assertIn(
+            'octofit_mongo_pool_checkout_failures_total{server="mongo.test:27017",reason="timeout"} 1', body)
+        listener.pool_closed(server)
+
+
+class ActivityFilterTest(APITestCase):
+    def setUp(self):
+        self.ana = 'a' * 24
+        rows = [
+            (self.ana, 'Running', 300, datetime(2024, 3, 1, 8)),
+            (self.ana, 'Yoga', 120, datetime(2024, 3, 2, 8)),
+            (self.ana, 'Running', 500, datetime(2024, 3, 3, 8)),
+            ('b' * 24, 'Running', 700, datetime(2024, 3, 2, 9)),
+        ]
+        for user_id, activity_type, calories, date in rows:
+            Activity.objects.create(user_id=user_id, activity_type=activity_type, duration=30,
+                                    calories=calories, date=timezone.make_aware(date, timezone.utc))
+
+    def calories(self, **params):
+        response = self.client.get('/api/activities/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [row['calories'] for row in response.data['results']]
+
+    def test_user_history_newest_first(self):
+        self.assertEqual(self.calories(user_id=self.ana), [500, 120, 300])
+        self.assertEqual(self.calories(user_id=self.ana, ordering='-calories'), [500, 300, 120])
+        self.assertEqual(self.calories(user_id=self.ana, activity_type='Running', min_calories=400), [500])
+
+    def test_date_range(self):
+        self.assertEqual(self.calories(date_from='2024-03-02', date_to='2024-03-02'), [700, 120])
+        self.assertEqual(self.calories(activity_type='Running', date_to='2024-03-01T23:00:00Z'), [300])
+
+    def test_filtered_pages(self):
+        response = self.client.get('/api/activities/', {'user_id': self.ana, 'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['calories'] for row in response.data['results']], [300])
+
+    def test_unindexed_combinations_are_rejected(self):
+        for params in ({'ordering': '-calories'}, {'min_calories': 100}, {'activity_type': 'Yoga', 'ordering': 'calories'}):
+            response = self.client.get('/api/activities/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertIn('Supported combinations', response.data['filters'][0])
+
+    def test_invalid_values(self):
+        self.assertIn('date_from', self.client.get('/api/activities/', {'date_from': 'yesterday'}).data)
+        self.assertIn('min_calories', self.client.get('/api/activities/', {'user_id': self.ana, 'min_calories': 'x'}).data)
+        self.assertIn('ordering', self.client.get('/api/activities/', {'ordering': 'duration'}).data)
+
+
+@override_settings(SEARCH_BACKEND='memory')
+class SearchTest(APITestCase):
+    def setUp(self):
+        User.objects.create(name='Ana Souza', email='ana@example.com', team='Equipe Azul')
+        User.objects.create(name='Anabela Reis', email='bela@example.com', team='Equipe Verde')
+        User.objects.create(name='Bruno Lima', email='bruno@example.com', team='Equipe Ana')
+        Workout.objects.create(name='Corrida Intervalada', description='Tiros curtos de alta intensidade',
+                               activity_type='Running', difficulty='Hard', duration=30, calories_estimate=400)
+
+    def test_search_ranks_names_first(self):
+        response = self.client.get('/api/search/', {'q': 'ana'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [user['name'] for user in response.data['users']]
+        # Word and prefix match, prefix only, team match.
+        self.assertEqual(names, ['Ana Souza', 'Anabela Reis', 'Bruno Lima'])
+        self.assertGreater(response.data['users'][0]['score'], response.data['users'][1]['score'])
+        self.assertEqual(response.data['workouts'], [])
+
+    def test_accents_and_types(self):
+        response = self.client.get('/api/search/', {'q': 'INTENSIDADE', 'type': 'workouts'})
+        self.assertEqual([workout['name'] for workout in response.data['workouts']], ['Corrida Intervalada'])
+        self.assertNotIn('users', response.data)
+
+    def test_index_follows_writes(self):
+        self.assertEqual(self.client.get('/api/search/', {'q': 'zoe'}).data['users'], [])
+        User.objects.create(name='Zoé Martins', email='zoe@example.com')
+        self.assertEqual(self.client.get('/api/search/', {'q': 'zoe'}).data['users'][0]['name'], 'Zoé Martins')
+
+    def test_invalid_parameters(self):
+        self.assertIn('q', self.client.get('/api/search/').data)
+        self.assertIn('type', self.client.get('/api/search/', {'q': 'ana', 'type': 'teams'}).data)
+        self.assertIn('limit', self.client.get('/api/search/', {'q': 'ana', 'limit': 0}).data)
+
+    def test_text_indexes_are_created(self):
+        search.ensure_text_indexes()
+        self.assertTrue(search.has_text_index('users'))
+        self.assertTrue(search.has_text_index('workouts'))
+
+    def test_admin_search(self):
+        from django.contrib.admin.sites import site
+        admin = site._registry[User]
+        queryset, may_have_duplicates = admin.get_search_results(None, User.objects.all(), 'bruno')
+        self.assertEqual([user.name for user in queryset], ['Bruno Lima'])
+        self.assertFalse(may_have_duplicates)
+
+
+class RecommendedWorkoutsTest(APITestCase):
+    def setUp(self):
+        for name, activity_type, difficulty, duration, calories in [
+            ('Tempo Run', 'Running', 'Intermediate', 45, 450),
+            ('Heavy Lifting', 'Weightlifting', 'Advanced', 60, 400),
+            ('Gentle Yoga', 'Yoga', 'Beginner', 30, 90),
+        ]:
+            Workout.objects.create(name=name, description=name, activity_type=activity_type,
+                                   difficulty=difficulty, duration=duration, calories_estimate=calories)
+        self.runner = User.objects.create(name='Runner', email='runner@example.com', age=30,
+                                          fitness_goal='Manter a forma')
+        for days_ago in range(1, 15):
+            Activity.objects.create(user_id=str(self.runner._id), activity_type='Running', duration=40,
+                                    calories=400, date=timezone.now() - timedelta(days=days_ago))
+        self.lifter = User.objects.create(name='Lifter', email='lifter@example.com', age=25,
+                                          fitness_goal='Ganhar massa')
+        self.newcomer = User.objects.create(name='Newcomer', email='new@example.com', age=68,
+                                            weight=110, height=170, fitness_goal='Perder peso')
+
+    def names(self, user, **params):
+        response = self.client.get(f'/api/users/{user._id}/recommended-workouts/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [workout['name'] for workout in response.data['results']]
+
+    def test_profiles_get_different_workouts(self):
+        self.assertEqual(self.names(self.runner)[0], 'Tempo Run')
+        self.assertEqual(self.names(self.lifter)[0], 'Heavy Lifting')
+        # Untrained, older and a high BMI: the advanced workout comes last.
+        self.assertEqual(self.names(self.newcomer)[-1], 'Heavy Lifting')
+
+    def test_scores_are_ordered(self):
+        response = self.client.get(f'/api/users/{self.runner._id}/recommended-workouts/')
+        scores = [workout['score'] for workout in response.data['results']]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(len(scores), 3)
+        self.assertIn('limit', self.client.get(
+            f'/api/users/{self.runner._id}/recommended-workouts/', {'limit': 0}).data)
+
+    def test_matrix_is_rebuilt_only_when_workouts_change(self):
+        from . import recommendations
+        matrix = recommendations.workout_matrix()
+        self.assertIs(recommendations.workout_matrix(), matrix)
+        Workout.objects.create(name='Sprint Intervals', description='Sprints', activity_type='Running',
+                               difficulty='Advanced', duration=20, calories_estimate=300)
+        self.assertEqual(len(recommendations.workout_matrix().workouts), 4)
+
+    def test_batch_command(self):
+        output = StringIO()
+        call_command('recommend_workouts', '--limit', '2', '--batch-size', '2', stdout=output)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(len(lines), 3)
+        by_name = {line['name']: line for line in lines}
+        self.assertEqual(by_name['Lifter']['workouts'][0]['name'], 'Heavy Lifting')
+        self.assertEqual(len(by_name['Runner']['workouts']), 2)
+
+
+class CalorieEstimateTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(name='Heavy Runner', email='heavy@example.com', weight=90)
+
+    def activity(self, **values):
+        return dict({
+            'user_id': str(self.user._id), 'activity_type': 'Running', 'duration': 60,
+            'distance': 10.0, 'date': '2024-03-01T08:00:00Z',
+        }, **values)
+
+    def test_batch_matches_single_estimates(self):
+        from . import energy
+        types = ['Running', 'running', 'Yoga', 'Cycling', 'Unknown']
+        durations = [60, 30, 45, 90, 20]
+        distances = [12.0, None, None, 30.0, 1.0]
+        weights = [80, None, 55.5, 0, 70]
+        batch = energy.estimate_many(types, durations, distances, weights)
+        self.assertEqual(list(batch), [energy.estimate(*row) for row in zip(types, durations, distances, weights)])
+        # 12 km/h is 11.35 MET: 11.35 * 3.5 * 80 / 200 * 60
+        self.assertEqual(batch[0], 953)
+        # Faster is costlier, heavier is costlier.
+        self.assertGreater(energy.estimate('Running', 60, 14), energy.estimate('Running', 60, 10))
+        self.assertGreater(energy.estimate('Yoga', 60, weight=90), energy.estimate('Yoga', 60, weight=60))
+
+    def test_synthetic_activities_are_estimated(self):
+        from . import energy
+        activities = list(synthetic.generate_activities(random.Random(3), 'u1', 10, synthetic.anchor_date(), None, 82))
+        self.assertTrue(activities)
+        for activity in activities:
+            self.assertEqual(activity['calories'], energy.estimate(
+                activity['activity_type'], activity['duration'], activity['distance'], 82))
+
+    def test_create_without_calories_uses_the_users_weight(self):
+        from . import energy
+        response = self.client.post('/api/activities/', self.activity(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['calories'], energy.estimate('Running', 60, 10.0, 90))
+        self.assertEqual(Leaderboard.objects.get(user_id=str(self.user._id)).total_calories,
+                         response.data['calories'])
+
+        response = self.client.post('/api/activities/', self.activity(calories=123), format='json')
+        self.assertEqual(response.data['calories'], 123)
+
+    def test_bulk_and_import_estimate_missing_calories(self):
+        from . import energy
+        expected = energy.estimate('Running', 60, 10.0, 90)
+        response = self.client.post('/api/activities/bulk/', [self.activity(), self.activity(calories=None)],
+                                    format='json')
+        self.assertEqual(response.data['created'], 2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'activities.csv')
+            with open(path, 'w') as output:
+                output.write('user_id,activity_type,duration,calories,distance,date\n'
+                             f'{self.user._id},Running,60,,10.0,2024-01-01T10:00:00Z\n')
+            call_command('import_data', 'activities', path, stdout=StringIO())
+        self.assertEqual(sorted(set(Activity.objects.values_list('calories', flat=True))), [expected])
+
+    def test_backfill_command(self):
+        from . import energy
+        Activity.objects.create(user_id=str(self.user._id), activity_type='Yoga', duration=60,
+                                calories=999, date=timezone.now())
+        mongo.get_collection(Activity).insert_one(
+            {'user_id': 'someone', 'activity_type': 'Boxing', 'duration': 30, 'calories': None,
+             'distance': None, 'date': timezone.now()})
+
+        call_command('estimate_calories', stdout=StringIO())
+        self.assertEqual(Activity.objects.get(activity_type='Boxing').calories, energy.estimate('Boxing', 30))
+        self.assertEqual(Activity.objects.get(activity_type='Yoga').calories, 999)
+
+        call_command('estimate_calories', '--recompute', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(Activity.objects.get(activity_type='Yoga').calories, energy.estimate('Yoga', 60, weight=90))
+        self.assertEqual(Leaderboard.objects.get(user_id=str(self.user._id)).total_calories,
+                         energy.estimate('Yoga', 60, weight=90))
+
+
+class SparseFieldsetTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(name='Sparse User', email='sparse@example.com', team='Sparse Team',
+                                        bio='A long biography ' * 50)
+        for day in range(1, 4):
+            Activity.objects.create(user_id=str(self.user._id), activity_type='Yoga', duration=30,
+                                    calories=100 * day, date=datetime(2024, 4, day, 7, 0))
+            Leaderboard.objects.create(user_id=f'user-{day}', user_name=f'User {day}', team='T',
+                                       total_calories=100 * day, total_activities=1, rank=4 - day)
+
+    def rows(self, url, **settings):
+        with self.settings(**settings):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data['results'] if 'results' in response.data else response.data
+
+    def test_every_read_path_returns_only_the_selected_fields(self):
+        for native in (False, True):
+            rows = self.rows('/api/users/?fields=name,team', NATIVE_MONGO_READS=native)
+            self.assertEqual(rows, [{'name': 'Sparse User', 'team': 'Sparse Team'}])
+            row = self.rows(f'/api/users/{self.user._id}/?exclude=bio,created_at,updated_at',
+                            NATIVE_MONGO_READS=native)
+            self.assertNotIn('bio', row)
+            self.assertEqual(row['email'], 'sparse@example.com')
+            rows = self.rows('/api/activities/?fields=calories&ordering=calories&user_id=' + str(self.user._id))
+            self.assertEqual(rows, [{'calories': 100}, {'calories': 200}, {'calories': 300}])
+        self.assertEqual(self.rows('/api/teams/?fields=name'), [])
+        self.assertEqual(self.rows('/api/workouts/?exclude=description'), [])
+
+        response = async_to_sync(AsyncClient().get)('/api/users/?fields=_id,name', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['results'], [{'_id': str(self.user._id), 'name': 'Sparse User'}])
+
+    def test_projection_keeps_the_cursor_fields(self):
+        from . import fieldsets
+        from .serializers import LeaderboardSerializer, UserSerializer
+        self.assertEqual(fieldsets.projection(UserSerializer, ('id', 'name')), {'_id': 1, 'name': 1})
+        self.assertEqual(fieldsets.projection(LeaderboardSerializer, ('user_name',), ('rank', '_id')),
+                         {'_id': 1, 'rank': 1, 'user_name': 1})
+
+        with self.settings(NATIVE_MONGO_READS=True):
+            first = self.client.get('/api/leaderboard/?fields=user_name&page_size=2')
+            second = self.client.get(first.data['next'])
+        self.assertEqual([row['user_name'] for row in first.data['results'] + second.data['results']],
+                         ['User 3', 'User 2', 'User 1'])
+        self.assertEqual(first.data['results'][0], {'user_name': 'User 3'})
+
+    def test_expand_and_windowed_leaderboard(self):
+        rows = self.rows('/api/activities/?fields=calories&expand=user')
+        self.assertEqual(set(rows[0]), {'calories', 'user_id', 'user'})
+        self.assertEqual(rows[0]['user']['name'], 'Sparse User')
+        # Windowed rankings are read from the rollups, which API writes maintain.
+        self.client.post('/api/activities/', {'user_id': str(self.user._id), 'activity_type': 'Yoga',
+                                              'duration': 30, 'calories': 90, 'date': '2024-04-05T07:00:00Z'})
+        response = self.client.get('/api/leaderboard/?window=all&fields=rank,user_name')
+        self.assertEqual(response.data['results'], [{'rank': 1, 'user_name': 'Sparse User'}])
+
+    def test_invalid_selection(self):
+        response = self.client.get('/api/users/?fields=name,password')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('password', response.data['fields'][0])
+        response = self.client.get('/api/users/?fields=name&exclude=name')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = async_to_sync(AsyncClient().get)('/api/users/?exclude=nope', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('exclude', response.json())
@@ -19,6 +19,10 @@ from rest_framework import routers
 import os
 from .views import (
     api_root,
+    stats,
+    search_view,
+    activity_export,
+    metrics,
     UserViewSet,
     TeamViewSet,
     ActivityViewSet,
@@ -43,5 +47,9 @@ router.register(r'workouts', WorkoutViewSet)
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', api_root, name='api-root'),
+    path('api/stats/', stats, name='api-stats'),
+    path('api/search/', search_view, name='api-search'),
+    path('api/activities/export/', activity_export, name='activity-export'),
+    path('api/_metrics', metrics, name='api-metrics'),
     path('api/', include(router.urls)),
 ]
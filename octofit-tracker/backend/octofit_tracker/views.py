@@ -1,9 +1,28 @@
-from rest_framework import viewsets
-from rest_framework.decorators import api_view
+import copy
+from datetime import timedelta
+
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from rest_framework import status, viewsets
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
-from bson import ObjectId
-from .models import User, Team, Activity, Leaderboard, Workout
+from django.conf import settings
+from . import (
+    caching, export, fieldsets, filters, ingest, instrumentation, leaderboard, recommendations, rollups, search,
+    standings,
+)
+from .models import User, Team, Activity, Leaderboard, Workout, ActivityRollup
+from .caching import CachedResponseMixin
+from .expand import ExpandMixin
+from .fast_serializers import FastListMixin, compile_serializer
+from .fieldsets import SparseFieldsetMixin
+from .mongo import get_collection, serialize_document, to_object_id
+from .native import NativeReadMixin
+from .parsers import NDJSONParser
 from .serializers import (
     UserSerializer,
     TeamSerializer,
@@ -21,45 +40,346 @@ def api_root(request, format=None):
         'activities': reverse('activity-list', request=request, format=format),
         'leaderboard': reverse('leaderboard-list', request=request, format=format),
         'workouts': reverse('workout-list', request=request, format=format),
+        'stats': reverse('api-stats', request=request, format=format),
+        'search': reverse('api-search', request=request, format=format),
     })
 
 
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
-    serializer_class = UserSerializer
-    lookup_field = '_id'
-    lookup_value_regex = '[0-9a-f]{24}'
-    
+STATS_PIPELINE = [
+    {'$facet': {
+        'count': [{'$count': 'value'}],
+        'calories': [{'$group': {'_id': None, 'value': {'$sum': '$calories'}}}],
+        'recent': [
+            {'$sort': {'date': -1}},
+            {'$limit': 5},
+            {'$project': {
+                'user_id': 1, 'activity_type': 1, 'duration': 1,
+                'calories': 1, 'distance': 1, 'date': 1,
+            }},
+        ],
+    }},
+]
+TOP_USERS_PROJECTION = {
+    'user_id': 1, 'user_name': 1, 'team': 1, 'total_calories': 1, 'total_activities': 1, 'rank': 1,
+}
+
+
+def build_stats(activity_facets, top_users, total_users, total_teams):
+    count = activity_facets['count']
+    calories = activity_facets['calories']
+    return {
+        'total_users': total_users,
+        'total_teams': total_teams,
+        'total_activities': count[0]['value'] if count else 0,
+        'total_calories': calories[0]['value'] if calories else 0,
+        'recent_activities': [serialize_document(doc) for doc in activity_facets['recent']],
+        'top_users': [serialize_document(doc) for doc in top_users],
+    }
+
+
+# Any write to these changes the stats; see caching.summary_key.
+STATS_MODELS = (Activity, Leaderboard, User, Team)
+
+
+@api_view(['GET'])
+def stats(request, format=None):
+    """Dashboard summary computed server-side, cached until one of ``STATS_MODELS`` is written."""
+    key = caching.summary_key('stats', STATS_MODELS)
+    data = caching.get_summary(key)
+    if data is None:
+        activity_facets = next(get_collection(Activity, read_only=True).aggregate(STATS_PIPELINE))
+        top_users = get_collection(Leaderboard, read_only=True).find({}, TOP_USERS_PROJECTION).sort('rank', 1).limit(3)
+        data = build_stats(
+            activity_facets,
+            top_users,
+            get_collection(User, read_only=True).estimated_document_count(),
+            get_collection(Team, read_only=True).estimated_document_count(),
+        )
+        caching.set_summary(key, data)
+    return Response(data)
+
+
+SEARCH_SERIALIZERS = {'users': UserSerializer, 'workouts': WorkoutSerializer}
+
+
+@api_view(['GET'])
+def search_view(request, format=None):
+    """Users and workouts matching ``?q=``, best first (``?type=users,workouts&limit=``)."""
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        raise ValidationError({'q': ['This parameter is required.']})
+    if len(query) > search.MAX_QUERY_LENGTH:
+        raise ValidationError({'q': [f'Ensure this value has at most {search.MAX_QUERY_LENGTH} characters.']})
+    kinds = request.query_params.get('type', ','.join(SEARCH_SERIALIZERS)).split(',')
+    unknown = [kind for kind in kinds if kind not in SEARCH_SERIALIZERS]
+    if unknown:
+        raise ValidationError({'type': [f'Expected any of: {", ".join(SEARCH_SERIALIZERS)}.']})
+    try:
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        raise ValidationError({'limit': ['A valid integer is required.']})
+    if not 1 <= limit <= 50:
+        raise ValidationError({'limit': ['Ensure this value is between 1 and 50.']})
+
+    data = {'query': query}
+    for kind in kinds:
+        serializer = compile_serializer(SEARCH_SERIALIZERS[kind], documents=True)
+        _, documents = search.search(kind, query, limit)
+        data[kind] = [
+            dict(serializer.to_representation(document), score=round(document['score'], 3))
+            for document in documents
+        ]
+    return Response(data)
+
+
+@require_GET
+def activity_export(request):
+    """Stream every activity (or those created after ``since``) as NDJSON or CSV.
+
+    A plain Django view: DRF would treat ``?format=`` as a renderer choice.
+    """
+    output_format = request.GET.get('format', 'ndjson')
+    if output_format not in export.CONTENT_TYPES:
+        return JsonResponse({'format': [f'Expected one of: {", ".join(export.CONTENT_TYPES)}.']}, status=400)
+    since = None
+    if request.GET.get('since'):
+        try:
+            since = export.parse_since(request.GET['since'])
+        except ValueError:
+            return JsonResponse({'since': ['Expected an ISO 8601 date or datetime.']}, status=400)
+    compress = request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+    filename = f'activities.{output_format}' + ('.gz' if compress else '')
+    response = StreamingHttpResponse(
+        export.export_activities(output_format, since=since, compress=compress),
+        content_type='application/gzip' if compress else export.CONTENT_TYPES[output_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@require_GET
+def metrics(request):
+    """Request metrics of this process in the Prometheus text format."""
+    return HttpResponse(instrumentation.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def trends_response(request, scope, key):
+    period = request.query_params.get('period', 'day')
+    if period not in rollups.PERIODS:
+        raise ValidationError({'period': [f'Expected one of: {", ".join(rollups.PERIODS)}.']})
+    try:
+        days = int(request.query_params.get('days', 30))
+    except ValueError:
+        raise ValidationError({'days': ['A valid integer is required.']})
+    if not 1 <= days <= 366:
+        raise ValidationError({'days': ['Ensure this value is between 1 and 366.']})
+
+    end = timezone.now()
+    buckets = rollups.series(scope, key, period, end - timedelta(days=days - 1), end)
+    return Response({
+        'period': period,
+        'buckets': [serialize_document(bucket) for bucket in buckets],
+    })
+
+
+class ObjectIdLookupMixin:
+    """Look objects up by ``_id`` as an ObjectId.
+
+    djongo passes a string primary key through to Mongo unconverted, so the
+    default ``get_object`` never matches; malformed ids are a 404.
+    """
+    not_found_message = None
+
     def get_object(self):
         queryset = self.filter_queryset(self.get_queryset())
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
-        _id_str = self.kwargs[lookup_url_kwarg]
-        
+        object_id = to_object_id(self.kwargs[lookup_url_kwarg])
+        if object_id is None:
+            raise NotFound(self.not_found_message)
         try:
-            obj = queryset.get(_id=ObjectId(_id_str))
-        except (User.DoesNotExist, Exception):
-            from rest_framework.exceptions import NotFound
-            raise NotFound('User not found.')
-        
+            obj = queryset.get(_id=object_id)
+        except queryset.model.DoesNotExist:
+            raise NotFound(self.not_found_message)
+
         self.check_object_permissions(self.request, obj)
         return obj
 
 
-class TeamViewSet(viewsets.ModelViewSet):
+class UserViewSet(ObjectIdLookupMixin, SparseFieldsetMixin, NativeReadMixin, FastListMixin, viewsets.ModelViewSet):
+    queryset = User.objects.all()
+    serializer_class = UserSerializer
+    lookup_field = '_id'
+    lookup_value_regex = '[0-9a-f]{24}'
+    not_found_message = 'User not found.'
+    query_budgets = {'list': 1, 'retrieve': 1, 'trends': 2, 'recommended_workouts': 3}
+
+    @action(detail=True)
+    def trends(self, request, _id=None):
+        """Daily or weekly totals for this user, read from the rollups."""
+        return trends_response(request, 'user', str(self.get_object()._id))
+
+    @action(detail=True, url_path='recommended-workouts')
+    def recommended_workouts(self, request, _id=None):
+        """Workouts ranked for this user's profile and recent activity mix."""
+        try:
+            limit = int(request.query_params.get('limit', 5))
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+        if not 1 <= limit <= 50:
+            raise ValidationError({'limit': ['Ensure this value is between 1 and 50.']})
+        user = self.get_object()
+        profile = {field: getattr(user, field) for field in recommendations.PROFILE_FIELDS}
+        serializer = compile_serializer(WorkoutSerializer, documents=True)
+        return Response({
+            'user_id': str(user._id),
+            'history_days': recommendations.HISTORY_DAYS,
+            'results': [
+                dict(serializer.to_representation(workout), score=round(score, 3))
+                for workout, score in recommendations.recommend(profile, limit)
+            ],
+        })
+
+
+class TeamViewSet(ObjectIdLookupMixin, SparseFieldsetMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
+    query_budgets = {'list': 1, 'retrieve': 1, 'trends': 2, 'standings': 4, 'leaderboard': 3}
 
+    @action(detail=True)
+    def trends(self, request, pk=None):
+        """Daily or weekly totals for this team, read from the rollups."""
+        return trends_response(request, 'team', self.get_object().name)
+
+    @action(detail=True)
+    def standings(self, request, pk=None):
+        """Member count, totals and top members, aggregated server-side."""
+        try:
+            top = int(request.query_params.get('top', 5))
+        except ValueError:
+            raise ValidationError({'top': ['A valid integer is required.']})
+        if not 1 <= top <= 100:
+            raise ValidationError({'top': ['Ensure this value is between 1 and 100.']})
+        team = self.get_object()
+        return Response(serialize_document(standings.standings(team._id, team.name, top=top)))
 
-class ActivityViewSet(viewsets.ModelViewSet):
+    @action(detail=False)
+    def leaderboard(self, request):
+        """All teams ranked by total calories."""
+        return Response(standings.team_leaderboard())
+
+
+class ActivityViewSet(ObjectIdLookupMixin, SparseFieldsetMixin, ExpandMixin, NativeReadMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
+    cursor_ordering = ('-date', '-_id')
+    sync_query_params = ('expand',) + filters.PARAMS
+    # Writes also maintain the leaderboard and the rollups, and look up the
+    # user's weight when calories are estimated.
+    query_budgets = {
+        'list': 2, 'retrieve': 1, 'create': 9, 'update': 10, 'partial_update': 10, 'destroy': 8,
+    }
+
+    def get_document_filter(self):
+        """``?user_id=&activity_type=&date_from=&date_to=&min_calories=&ordering=``; see ``filters``."""
+        compiled = filters.compile_activity_query(self.request.query_params)
+        if compiled is None:
+            return None
+        query, self.cursor_ordering = compiled
+        return query
+
+    def perform_create(self, serializer):
+        activity = serializer.save(team=rollups.team_of(serializer.validated_data['user_id']))
+        leaderboard.record_activity(activity)
+        rollups.record_activity(activity)
+
+    def perform_update(self, serializer):
+        previous = copy.copy(serializer.instance)
+        user_id = serializer.validated_data.get('user_id', previous.user_id)
+        team = previous.team
+        if team is None or user_id != previous.user_id:
+            team = rollups.team_of(user_id)
+        activity = serializer.save(team=team)
+        leaderboard.update_activity(previous.user_id, previous.calories, activity)
+        rollups.update_activity(previous, activity)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        leaderboard.remove_activity(instance)
+        rollups.remove_activity(instance)
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Create many activities from a JSON array or an NDJSON body."""
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of activities.']})
+        if len(items) > settings.BULK_MAX_ITEMS:
+            raise ValidationError({'non_field_errors': [
+                f'Expected at most {settings.BULK_MAX_ITEMS} activities per request; got {len(items)}.'
+            ]})
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', ingest.default_chunk_size()))
+        except ValueError:
+            raise ValidationError({'chunk_size': ['A valid integer is required.']})
+        if chunk_size < 1:
+            raise ValidationError({'chunk_size': ['Ensure this value is greater than or equal to 1.']})
 
+        results = ingest.insert_activities(items, chunk_size=chunk_size)
+        created = sum(1 for result in results if result['status'] == 'created')
+        return Response(
+            {'created': created, 'failed': len(results) - created, 'results': results},
+            status=status.HTTP_201_CREATED if created == len(results) else status.HTTP_207_MULTI_STATUS,
+        )
 
-class LeaderboardViewSet(viewsets.ModelViewSet):
+
+class LeaderboardViewSet(ObjectIdLookupMixin, SparseFieldsetMixin, CachedResponseMixin, ExpandMixin, NativeReadMixin,
+                         FastListMixin, viewsets.ModelViewSet):
     queryset = Leaderboard.objects.all().order_by('rank')
     serializer_class = LeaderboardSerializer
+    cursor_ordering = ('rank', '_id')
+    secondary_reads = True
+    query_budgets = {'list': 3, 'retrieve': 1}
+
+    def get_cache_key(self, request):
+        key = super().get_cache_key(request)
+        if 'window' not in request.query_params:
+            return key
+        # Windows end today, so cached windowed pages roll over at midnight.
+        return ':'.join([key, caching.generation(ActivityRollup), timezone.now().date().isoformat()])
+
+    def list(self, request, *args, **kwargs):
+        if 'window' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self._cached(request, lambda: self.windowed(request))
+
+    def windowed(self, request):
+        """Top-N (and optionally one user's rank) over ``?window=``, e.g. 7d, 4w, month, all."""
+        params = request.query_params
+        window = params['window']
+        try:
+            period, start = leaderboard.parse_window(window)
+        except ValueError:
+            raise ValidationError({'window': [
+                f'Expected Nd, Nw (up to {leaderboard.MAX_WINDOW_DAYS} days), week, month or all.'
+            ]})
+        try:
+            limit = int(params.get('limit', 10))
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+        if not 1 <= limit <= settings.API_MAX_PAGE_SIZE:
+            raise ValidationError({'limit': [f'Ensure this value is between 1 and {settings.API_MAX_PAGE_SIZE}.']})
+
+        team = params.get('team') or None
+        data = leaderboard.windowed(period, start, team=team, limit=limit, user_id=params.get('user_id') or None)
+        if self.fieldset is not None:
+            data['results'] = [fieldsets.restrict(row, self.fieldset) for row in data['results']]
+            if data['me'] is not None:
+                data['me'] = fieldsets.restrict(data['me'], self.fieldset)
+        return Response(serialize_document({'window': window, 'start': start, 'team': team, **data}))
 
 
-class WorkoutViewSet(viewsets.ModelViewSet):
+class WorkoutViewSet(ObjectIdLookupMixin, SparseFieldsetMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Workout.objects.all()
     serializer_class = WorkoutSerializer
+    query_budgets = {'list': 1, 'retrieve': 1}
@@ -9,8 +9,17 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'octofit_tracker.settings')
 
 application = get_wsgi_application()
+
+# Connect before the first request arrives. Servers that fork after loading
+# the application (gunicorn --preload) must not do this in the parent, as
+# pymongo clients are not fork-safe.
+if settings.MONGO_WARM_UP:
+    from octofit_tracker.mongo import warm_up
+
+    warm_up()
@@ -1,18 +1,45 @@
 import React, { useState, useEffect } from 'react';
-import { useNavigate } from 'react-router-dom';
+import { useNavigate, useSearchParams } from 'react-router-dom';
+import '../styles/Modal.css';
+
+// The types the backend seeds and generates (populate_db, synthetic.ACTIVITY_PROFILES)
+const ACTIVITY_TYPES = ['Running', 'Cycling', 'Swimming', 'Weightlifting', 'Yoga', 'Boxing'];
 
 function Activities() {
   const navigate = useNavigate();
+  const [searchParams] = useSearchParams();
   const [activities, setActivities] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [filterError, setFilterError] = useState(null);
+  // Filtering and sorting happen on the server; ?user_id= opens one athlete's history
+  const [filters, setFilters] = useState({
+    user_id: searchParams.get('user_id') || '',
+    activity_type: '',
+    date_from: '',
+    date_to: '',
+    min_calories: '',
+    ordering: '-date',
+  });
 
   useEffect(() => {
-    const apiUrl = `https://${process.env.REACT_APP_CODESPACE_NAME}-8000.app.github.dev/api/activities/`;
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== '') {
+        params.append(key, value);
+      }
+    });
+    const apiUrl = `https://${process.env.REACT_APP_CODESPACE_NAME}-8000.app.github.dev/api/activities/?${params}`;
     console.log('Activities API endpoint:', apiUrl);
 
     fetch(apiUrl)
       .then(response => {
+        if (response.status === 400) {
+          // Invalid value or a combination no index serves
+          return response.json().then(data => {
+            throw Object.assign(new Error(Object.values(data).flat().join(' ')), { filter: true });
+          });
+        }
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`);
         }
@@ -22,14 +49,25 @@ function Activities() {
         console.log('Activities fetched data:', data);
         const activitiesData = data.results || data;
         setActivities(Array.isArray(activitiesData) ? activitiesData : []);
+        setFilterError(null);
         setLoading(false);
       })
       .catch(error => {
         console.error('Error fetching activities:', error);
-        setError(error.message);
+        if (error.filter) {
+          setFilterError(error.message);
+          setActivities([]);
+        } else {
+          setError(error.message);
+        }
         setLoading(false);
       });
-  }, []);
+  }, [filters]);
+
+  const handleFilterChange = (e) => {
+    const { name, value } = e.target;
+    setFilters(prev => ({ ...prev, [name]: value }));
+  };
 
   const getActivityIcon = (type) => {
     const icons = {
@@ -84,6 +122,54 @@ function Activities() {
         </p>
       </div>
 
+      <div className="glass-card" style={{ marginBottom: '1.5rem', padding: '1.5rem' }}>
+        <div className="form-row">
+          <div className="form-group">
+            <label htmlFor="activity_type">Tipo</label>
+            <select id="activity_type" name="activity_type" value={filters.activity_type} onChange={handleFilterChange}>
+              <option value="">Todos</option>
+              {ACTIVITY_TYPES.map(type => (
+                <option key={type} value={type}>{type}</option>
+              ))}
+            </select>
+          </div>
+          <div className="form-group">
+            <label htmlFor="ordering">Ordenar por</label>
+            <select id="ordering" name="ordering" value={filters.ordering} onChange={handleFilterChange}>
+              <option value="-date">Mais recentes</option>
+              <option value="date">Mais antigas</option>
+              {/* Only indexed per athlete */}
+              {filters.user_id && <option value="-calories">Mais calorias</option>}
+            </select>
+          </div>
+        </div>
+        <div className="form-row">
+          <div className="form-group">
+            <label htmlFor="date_from">De</label>
+            <input type="date" id="date_from" name="date_from" value={filters.date_from} onChange={handleFilterChange} />
+          </div>
+          <div className="form-group">
+            <label htmlFor="date_to">Até</label>
+            <input type="date" id="date_to" name="date_to" value={filters.date_to} onChange={handleFilterChange} />
+          </div>
+          <div className="form-group">
+            <label htmlFor="min_calories">Calorias mínimas</label>
+            <input
+              type="number"
+              id="min_calories"
+              name="min_calories"
+              min="0"
+              value={filters.min_calories}
+              onChange={handleFilterChange}
+              placeholder="0"
+            />
+          </div>
+        </div>
+        {filterError && (
+          <div style={{ color: 'var(--accent-danger)', fontSize: '0.85rem' }}>{filterError}</div>
+        )}
+      </div>
+
       <div className="activity-grid">
         {activities.length === 0 ? (
           <div className="glass-card" style={{ gridColumn: '1 / -1', textAlign: 'center', padding: '3rem' }}>
@@ -95,7 +181,7 @@ function Activities() {
         ) : (
           activities.map((activity, index) => (
             <div
-              key={activity.id}
+              key={activity._id || activity.id}
               className="activity-card fade-in"
               style={{ animationDelay: `${index * 0.05}s` }}
               onClick={() => navigate('/users')}
@@ -16,38 +16,21 @@ function Dashboard() {
   useEffect(() => {
     const baseUrl = `https://${process.env.REACT_APP_CODESPACE_NAME}-8000.app.github.dev/api`;
     
-    Promise.all([
-      fetch(`${baseUrl}/users/`).then(r => r.json()),
-      fetch(`${baseUrl}/teams/`).then(r => r.json()),
-      fetch(`${baseUrl}/activities/`).then(r => r.json()),
-      fetch(`${baseUrl}/leaderboard/`).then(r => r.json())
-    ])
-      .then(([usersData, teamsData, activitiesData, leaderboardData]) => {
-        const users = usersData.results || usersData;
-        const teams = teamsData.results || teamsData;
-        const activities = activitiesData.results || activitiesData;
-        const leaderboard = leaderboardData.results || leaderboardData;
-
-        const totalPoints = Array.isArray(users) 
-          ? users.reduce((sum, user) => sum + (user.points || 0), 0)
-          : 0;
-
+    fetch(`${baseUrl}/stats/`)
+      .then(r => r.json())
+      .then(data => {
         setStats({
-          totalUsers: Array.isArray(users) ? users.length : 0,
-          totalTeams: Array.isArray(teams) ? teams.length : 0,
-          totalActivities: Array.isArray(activities) ? activities.length : 0,
-          totalPoints: totalPoints
+          totalUsers: data.total_users || 0,
+          totalTeams: data.total_teams || 0,
+          totalActivities: data.total_activities || 0,
+          totalPoints: data.total_calories || 0
         });
 
         // Recent activities (últimas 5)
-        if (Array.isArray(activities)) {
-          setRecentActivities(activities.slice(0, 5));
-        }
+        setRecentActivities(Array.isArray(data.recent_activities) ? data.recent_activities : []);
 
         // Top 3 users
-        if (Array.isArray(leaderboard)) {
-          setTopUsers(leaderboard.slice(0, 3));
-        }
+        setTopUsers(Array.isArray(data.top_users) ? data.top_users : []);
 
         setLoading(false);
       })
@@ -17,18 +17,28 @@ function EditUserModal({ user, onClose, onSave }) {
   const [error, setError] = useState(null);
 
   useEffect(() => {
-    if (user) {
+    const fillForm = (data) => {
       setFormData({
-        name: user.name || '',
-        email: user.email || '',
-        weight: user.weight || '',
-        height: user.height || '',
-        age: user.age || '',
-        gender: user.gender || '',
-        fitness_goal: user.fitness_goal || '',
-        bio: user.bio || '',
-        team: user.team || ''
+        name: data.name || '',
+        email: data.email || '',
+        weight: data.weight || '',
+        height: data.height || '',
+        age: data.age || '',
+        gender: data.gender || '',
+        fitness_goal: data.fitness_goal || '',
+        bio: data.bio || '',
+        team: data.team || ''
       });
+    };
+
+    if (user) {
+      fillForm(user);
+      // The list only fetches the columns it shows; load the full profile.
+      const apiUrl = `https://${process.env.REACT_APP_CODESPACE_NAME}-8000.app.github.dev/api/users/${user._id}/`;
+      fetch(apiUrl)
+        .then(response => (response.ok ? response.json() : null))
+        .then(data => data && fillForm(data))
+        .catch(err => console.error('Error loading user:', err));
     }
   }, [user]);
 
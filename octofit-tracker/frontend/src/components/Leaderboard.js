@@ -8,7 +8,7 @@ function Leaderboard() {
   const [error, setError] = useState(null);
 
   useEffect(() => {
-    const apiUrl = `https://${process.env.REACT_APP_CODESPACE_NAME}-8000.app.github.dev/api/leaderboard/`;
+    const apiUrl = `https://${process.env.REACT_APP_CODESPACE_NAME}-8000.app.github.dev/api/leaderboard/?fields=_id,user_name,team,total_calories,rank`;
     console.log('Leaderboard API endpoint:', apiUrl);
 
     fetch(apiUrl)
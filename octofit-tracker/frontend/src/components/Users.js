@@ -10,7 +10,7 @@ function Users() {
   const [editingUser, setEditingUser] = useState(null);
 
   useEffect(() => {
-    const apiUrl = `https://${process.env.REACT_APP_CODESPACE_NAME}-8000.app.github.dev/api/users/`;
+    const apiUrl = `https://${process.env.REACT_APP_CODESPACE_NAME}-8000.app.github.dev/api/users/?fields=_id,name,email,team`;
     console.log('Users API endpoint:', apiUrl);
 
     fetch(apiUrl)